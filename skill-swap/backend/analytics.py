@@ -0,0 +1,105 @@
+"""Time-bucketed counters for the admin analytics, maintained on every write"""
+from datetime import datetime, timedelta
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+
+
+def parse_days(args):
+    """Read the since (inclusive) / until (exclusive) dates from the query string.
+
+    Defaults to the DEFAULT_DAYS days up to and including today (UTC).
+    Returns the list of ISO dates in the range; raises ValueError for bad or
+    overlong ranges.
+    """
+    bounds = []
+    for name in ('since', 'until'):
+        value = args.get(name)
+        if value:
+            try:
+                value = datetime.fromisoformat(value).date()
+            except ValueError:
+                raise ValueError(f'{name} must be an ISO date')
+        bounds.append(value)
+    since, until = bounds
+    try:
+        if until is None:
+            until = since + timedelta(days=DEFAULT_DAYS) if since else datetime.utcnow().date() + timedelta(days=1)
+        if since is None:
+            since = until - timedelta(days=DEFAULT_DAYS)
+    except OverflowError:
+        # The default range would run past date.max or before date.min
+        raise ValueError(f'since must be before until and at most {MAX_DAYS} days earlier')
+    if not 0 < (until - since).days <= MAX_DAYS:
+        raise ValueError(f'since must be before until and at most {MAX_DAYS} days earlier')
+    return [(since + timedelta(days=n)).isoformat() for n in range((until - since).days)]
+
+
+class DailyRollup(object):
+    """Record counts per creation day and per value of one field.
+
+    Attached to a collection, so inserts, updates (remove the old record, add
+    the new one) and deletes adjust the counters and no query ever scans
+    records: a day range costs one lookup per day, whatever the history
+    size. Records are bucketed by the date part of their created_at.
+    """
+
+    def __init__(self, field, day_field='created_at'):
+        self.field = field
+        self.day_field = day_field
+        # day -> {value -> count}, and the same summed over every day
+        self._days = {}
+        self._totals = {}
+        self.version = 0
+
+    def check(self, record):
+        """Raise ValueError for a record whose field cannot be counted"""
+        value = record.get(self.field)
+        try:
+            hash(value)
+        except TypeError:
+            raise ValueError(f'{self.field} must be a single value, not {type(value).__name__}')
+
+    def add(self, record):
+        self._apply(record, 1)
+
+    def remove(self, record):
+        self._apply(record, -1)
+
+    def _apply(self, record, sign):
+        day = str(record.get(self.day_field) or '')[:10]
+        value = record.get(self.field)
+        hash(value)  # fail before any counter changes
+        counts = self._days.setdefault(day, {})
+        for tally in (counts, self._totals):
+            count = tally.get(value, 0) + sign
+            if count:
+                tally[value] = count
+            else:
+                del tally[value]
+        if not counts:
+            del self._days[day]
+        self.version += 1
+
+    def totals(self):
+        """value -> count over all records"""
+        return dict(self._totals)
+
+    def count(self, value):
+        return self._totals.get(value, 0)
+
+    def daily(self, days):
+        """[{date, total, counts: {value -> count}}] for each ISO date in days"""
+        series = []
+        for day in days:
+            counts = self._days.get(day, {})
+            series.append({'date': day, 'total': sum(counts.values()), 'counts': dict(counts)})
+        return series
+
+    def between(self, days):
+        """value -> count summed over the ISO dates in days"""
+        summed = {}
+        for day in days:
+            for value, count in self._days.get(day, {}).items():
+                summed[value] = summed.get(value, 0) + count
+        return summed
@@ -1,22 +1,121 @@
 from flask import Flask, jsonify, request, send_from_directory, Response
 from flask_cors import CORS
 from datetime import datetime
+import functools
+import itertools
 import os
-import csv
-from io import StringIO
+import time
+from store import FacetIndex, RecordCache, Repository
+from records import record_type
+from fastjson import FastJSONProvider, array, dumps as json_dumps, extend_object
+from storage import SQLiteBackend
+from journal import LogBackend
+from search import SubstringIndex, TextIndex, merge_ids
+from matching import SkillMatchIndex
+from inbox import STATUSES, SwapInbox
+from ratings import FeedbackIndex, RatingIndex, parse_rating
+from analytics import DailyRollup, parse_days
+from paging import MAX_LIMIT, paginate, parse_args, project
+from reports import csv_chunks, parse_range
+from compression import MIN_SIZE, Compressor
+from cache import ResponseCache, cached
+from events import EventBus
+from photos import AVATAR_SIZES, PhotoProcessor
+from metrics import Metrics
+from bulk import MAX_ERRORS, decode_lines, import_records, ndjson_chunks, number, read_csv, read_ndjson
 
 app = Flask(__name__)
-CORS(app)
+# orjson-backed encoding (stdlib json without it) that also serializes stored records
+app.json = FastJSONProvider(app)
+CORS(app, expose_headers=['X-Next-Cursor'])
+
+# Per-route latency/size/record metrics, enabled with SKILL_SWAP_METRICS=1; requests
+# are only profiled when their X-Profile header matches SKILL_SWAP_PROFILE_TOKEN
+metrics = Metrics(enabled=os.environ.get('SKILL_SWAP_METRICS') == '1',
+                  profile_token=os.environ.get('SKILL_SWAP_PROFILE_TOKEN'))
+metrics.init_app(app)
+
+# gzip/brotli for JSON and text bodies; SKILL_SWAP_COMPRESS_LEVEL=0 turns it off
+compression = Compressor(level=int(os.environ.get('SKILL_SWAP_COMPRESS_LEVEL', 6)),
+                         brotli_quality=int(os.environ.get('SKILL_SWAP_BROTLI_QUALITY', 4)),
+                         min_size=int(os.environ.get('SKILL_SWAP_COMPRESS_MIN_SIZE', MIN_SIZE)))
+compression.init_app(app)
 
 UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# Avatars are resized off the request thread and named by content hash
+photo_processor = PhotoProcessor(UPLOAD_FOLDER)
+
+# Storage is in-memory by default. Point SKILL_SWAP_DB at a SQLite file to
+# persist it and share it between worker processes, or SKILL_SWAP_DATA_DIR at
+# a directory to keep a single process's store in a write-ahead log + snapshots
+if os.environ.get('SKILL_SWAP_DB'):
+    repository = Repository(SQLiteBackend(os.environ['SKILL_SWAP_DB']))
+elif os.environ.get('SKILL_SWAP_DATA_DIR'):
+    repository = Repository(LogBackend(os.environ['SKILL_SWAP_DATA_DIR'],
+                                       snapshot_every=int(os.environ.get('SKILL_SWAP_SNAPSHOT_EVERY', 100000))))
+else:
+    repository = Repository()
+# Records are kept as slotted mappings with interned enum-like values and
+# integer timestamps; they read back exactly like the dicts handlers build
+User = record_type('User', ('id', 'username', 'email', 'first_name', 'last_name', 'bio', 'location',
+                            'profile_photo', 'availability', 'is_public', 'skills_offered', 'skills_wanted',
+                            'created_at', 'is_admin', 'banned'),
+                   interned=('location', 'availability'))
+Skill = record_type('Skill', ('id', 'user_id', 'title', 'description', 'category', 'proficiency_level',
+                              'hourly_rate', 'location', 'availability', 'tags', 'created_at'),
+                    interned=('category', 'proficiency_level', 'location', 'availability'))
+SwapRequest = record_type('SwapRequest', ('id', 'from_user_id', 'to_user_id', 'skill_id', 'message', 'status',
+                                          'feedback', 'rating', 'created_at'),
+                          interned=('status',))
+PlatformMessage = record_type('PlatformMessage', ('id', 'message', 'created_at'))
+users = repository.collection('users', unique=('username',), record_type=User)
+skills = repository.collection('skills', columns=('user_id', 'category', 'proficiency_level'), record_type=Skill)
+swap_requests = repository.collection('swap_requests', columns=('from_user_id', 'to_user_id', 'skill_id', 'status'),
+                                      record_type=SwapRequest)
+platform_messages = repository.collection('platform_messages', record_type=PlatformMessage)
+
+# Full-text search over skills; titles rank above tags, tags above descriptions
+skill_search = skills.attach(TextIndex({'title': 3, 'tags': 2, 'description': 1}))
+# Facet indexes behind the category/level/location filters and dropdown counts
+skill_categories = skills.attach(FacetIndex('category'))
+skill_levels = skills.attach(FacetIndex('proficiency_level'))
+skill_locations = skills.attach(FacetIndex('location'))
+# Each user's own skills, for the dashboard
+skill_owners = skills.attach(FacetIndex('user_id'))
+# Who offers and who wants each skill, for swap-partner recommendations
+skill_matches = users.attach(SkillMatchIndex())
+# Each user's incoming and outgoing swap requests, partitioned by status
+swap_inbox = swap_requests.attach(SwapInbox())
+# Rating aggregates from swap feedback; the rated user is the one who was asked
+user_ratings = swap_requests.attach(RatingIndex('to_user_id'))
+skill_ratings = swap_requests.attach(RatingIndex('skill_id'))
+swap_feedback = swap_requests.attach(FeedbackIndex())
+# Per-day counters behind the admin analytics
+swap_activity = swap_requests.attach(DailyRollup('status'))
+skill_activity = skills.attach(DailyRollup('category'))
+registrations = users.attach(DailyRollup('banned'))
+# Substring indexes behind the user search filters
+offered_skills = users.attach(SubstringIndex('skills_offered'))
+wanted_skills = users.attach(SubstringIndex('skills_wanted'))
+user_availability = users.attach(SubstringIndex('availability'))
+user_locations = users.attach(SubstringIndex('location'))
+
+# Swap request and platform message updates pushed to /api/events subscribers
+events = EventBus()
 
-# In-memory storage
-users = []
-skills = []
-swap_requests = []
-platform_messages = []
+# Rendered responses of the read-heavy skill endpoints, keyed on collection versions
+response_cache = ResponseCache(max_entries=1024)
+
+# How much of the user's swap history and of the announcements the dashboard shows
+DASHBOARD_RECENT_SWAPS = 5
+DASHBOARD_MESSAGES = 3
+
+# Columns of the admin CSV reports
+FEEDBACK_REPORT_FIELDS = ['id', 'from_user_id', 'to_user_id', 'skill_id', 'feedback', 'rating', 'created_at']
+SWAP_REPORT_FIELDS = ['id', 'from_user_id', 'to_user_id', 'skill_id', 'message', 'status', 'feedback', 'rating', 'created_at']
 
 # Demo skills data
 demo_skills = [
@@ -153,6 +252,158 @@ demo_users = [
     }
 ]
 
+def new_user(data):
+    """User record (without an id) from registration or import data"""
+    return {
+        'username': data['username'],
+        'email': data['email'],
+        'first_name': data['first_name'],
+        'last_name': data['last_name'],
+        'bio': data.get('bio', ''),
+        'location': data.get('location', ''),
+        'profile_photo': data.get('profile_photo', ''),
+        'availability': data.get('availability', ''),
+        'is_public': data.get('is_public', True),
+        'skills_offered': data.get('skills_offered', []),
+        'skills_wanted': data.get('skills_wanted', []),
+        'created_at': datetime.utcnow().isoformat(),
+        # Flags are counted by the registrations rollup, so store them as bools
+        'is_admin': bool(data.get('is_admin', False)),
+        'banned': bool(data.get('banned', False))
+    }
+
+# Skill fields kept in facet indexes, whose values must be strings
+SKILL_FACETS = ('category', 'proficiency_level', 'location')
+MAX_HOURLY_RATE = 1000000
+
+def new_skill(data, user):
+    """Skill record (without an id) offered by user; ValueError for a non-string
+    facet field, tags that are not a list of strings or an out-of-range hourly_rate"""
+    for field in SKILL_FACETS:
+        if field in data and not isinstance(data[field], str):
+            raise ValueError(f'{field} must be a string')
+    tags = data.get('tags', [])
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError('tags must be a list of strings')
+    rate = data.get('hourly_rate', 0)
+    # The comparison is also false for NaN
+    if isinstance(rate, bool) or not isinstance(rate, (int, float)) or not 0 <= rate <= MAX_HOURLY_RATE:
+        raise ValueError(f'hourly_rate must be a number from 0 to {MAX_HOURLY_RATE}')
+    return {
+        'user_id': user['id'],
+        'title': data['title'],
+        'description': data['description'],
+        'category': data['category'],
+        'proficiency_level': data['proficiency_level'],
+        'hourly_rate': rate,
+        'location': data.get('location', user['location']),
+        'availability': data.get('availability', user['availability']),
+        'tags': tags,
+        'created_at': datetime.utcnow().isoformat()
+    }
+
+def user_summary(user):
+    """Public fields shown next to a user's skills"""
+    return {
+        'id': user['id'],
+        'first_name': user['first_name'],
+        'last_name': user['last_name'],
+        'location': user['location'],
+        'profile_photo': user['profile_photo']
+    }
+
+def public_profile(user):
+    """Public fields returned by user search"""
+    return {
+        'id': user['id'],
+        'first_name': user['first_name'],
+        'last_name': user['last_name'],
+        'location': user['location'],
+        'profile_photo': user['profile_photo'],
+        'availability': user['availability'],
+        'skills_offered': user['skills_offered'],
+        'skills_wanted': user['skills_wanted'],
+        'bio': user['bio'],
+        'is_public': user['is_public']
+    }
+
+# Search results reuse each user's projection until their record changes
+public_profiles = users.attach(RecordCache(public_profile))
+
+# Encoded JSON per record, so unprojected listings are spliced together from
+# cached fragments; a write to a record drops its fragments
+skill_json = skills.attach(RecordCache(json_dumps))
+user_json = users.attach(RecordCache(json_dumps))
+swap_json = swap_requests.attach(RecordCache(json_dumps))
+public_profile_json = users.attach(RecordCache(lambda user: json_dumps(public_profile(user))))
+owner_json = users.attach(RecordCache(lambda user: json_dumps(user_summary(user))))
+
+def join_swaps(requests):
+    """Copies of swap requests with from_user/to_user/skill summaries attached"""
+    # Resolve every referenced user and skill once
+    people = users.get_many([r['from_user_id'] for r in requests] + [r['to_user_id'] for r in requests])
+    names = {uid: {'first_name': u['first_name'], 'last_name': u['last_name']} for uid, u in people.items()}
+    titles = {sid: {'title': s['title'], 'category': s['category']}
+              for sid, s in skills.get_many(r['skill_id'] for r in requests).items()}
+    metrics.note_rows(len(requests), 'joined')
+    results = []
+    for req in requests:
+        item = req.copy()
+        if req['from_user_id'] in names:
+            item['from_user'] = names[req['from_user_id']]
+        if req['to_user_id'] in names:
+            item['to_user'] = names[req['to_user_id']]
+        if req['skill_id'] in titles:
+            item['skill'] = titles[req['skill_id']]
+        results.append(item)
+    return results
+
+def publish_swap(action, req):
+    """Push a swap request change to the stream of both users involved"""
+    events.publish('swap_request', {'action': action, 'request': join_swaps([req])[0]},
+                   user_ids={req['from_user_id'], req['to_user_id']})
+
+def record_key(record):
+    """Keyset sort key for listings in id order"""
+    return [record['id']]
+
+def list_response(page, next_cursor, fields, encode=None):
+    """Serialize one page of a listing; the next page's cursor goes in X-Next-Cursor.
+
+    Without a field projection, `encode` (item -> JSON bytes, normally cached)
+    builds each item instead of the JSON encoder.
+    """
+    if encode is not None and fields is None:
+        response = app.response_class(array(encode(item) for item in page), mimetype='application/json')
+    else:
+        response = jsonify([project(item, fields) for item in page])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+@app.before_request
+def sync_store():
+    # Pick up writes made by other worker processes
+    repository.sync()
+
+def reads_store(view):
+    """Run the view's GET requests under every collection's read lock.
+
+    They then see no half-applied write, and writers wait until the view
+    returns. Views that block on anything else (files, event streams) must
+    not use it, or a queued writer would hold back every other reader.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(*args, **kwargs)
+        repository.acquire_read()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            repository.release_read()
+    return wrapper
+
 @app.route('/api/health')
 def health_check():
     return jsonify({
@@ -161,31 +412,42 @@ def health_check():
         'timestamp': datetime.utcnow().isoformat()
     })
 
+@app.route('/api/admin/metrics', methods=['GET'])
+def admin_metrics():
+    """Request metrics in Prometheus text format"""
+    if not users or not users.first().get('is_admin'):
+        return jsonify({'error': 'Admin only'}), 403
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/admin/profiles/<int:profile_id>', methods=['GET'])
+def admin_profile(profile_id):
+    """Folded stack samples of a request sent with the profiling token in X-Profile"""
+    if not users or not users.first().get('is_admin'):
+        return jsonify({'error': 'Admin only'}), 403
+    profile = metrics.profile(profile_id)
+    if not profile:
+        return jsonify({'error': 'Profile not found'}), 404
+    return Response(profile['folded'], mimetype='text/plain')
+
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     data = request.get_json()
     if not all(key in data for key in ['username', 'email', 'password', 'first_name', 'last_name']):
         return jsonify({'error': 'Missing required fields'}), 400
-    if any(user['username'] == data['username'] for user in users):
+    if not isinstance(data['username'], str):
+        return jsonify({'error': 'username must be a string'}), 400
+    if users.get_by('username', data['username']):
         return jsonify({'error': 'Username already exists'}), 400
-    user = {
-        'id': len(users) + 1,
-        'username': data['username'],
-        'email': data['email'],
-        'first_name': data['first_name'],
-        'last_name': data['last_name'],
-        'bio': data.get('bio', ''),
-        'location': data.get('location', ''),
-        'profile_photo': data.get('profile_photo', ''),
-        'availability': data.get('availability', ''),
-        'is_public': data.get('is_public', True),
-        'skills_offered': data.get('skills_offered', []),
-        'skills_wanted': data.get('skills_wanted', []),
-        'created_at': datetime.utcnow().isoformat(),
-        'is_admin': data.get('is_admin', False),
-        'banned': data.get('banned', False)
-    }
-    users.append(user)
+    user = dict(new_user(data), id=users.next_id())
+    try:
+        users.insert(user)
+    except KeyError:
+        # Registered by a concurrent request since the check above
+        return jsonify({'error': 'Username already exists'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({
         'message': 'User registered successfully',
         'user': user,
@@ -193,46 +455,68 @@ def register():
     }), 201
 
 @app.route('/api/auth/profile', methods=['GET', 'PUT'])
+@reads_store
 def profile():
     # For demo, use the first user as the logged-in user
     if not users:
         return jsonify({'error': 'No user found'}), 404
-    user = users[0]
+    user = users.first()
     if request.method == 'GET':
-        return jsonify(user)
+        return jsonify(dict(user.copy(), rating=user_ratings.summary(user['id'])))
     data = request.get_json()
-    for field in ['first_name', 'last_name', 'bio', 'location', 'profile_photo', 'availability', 'is_public', 'skills_offered', 'skills_wanted']:
-        if field in data:
-            user[field] = data[field]
+    changes = {field: data[field] for field in ['first_name', 'last_name', 'bio', 'location', 'profile_photo', 'availability', 'is_public', 'skills_offered', 'skills_wanted'] if field in data}
+    try:
+        users.update(user['id'], changes)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({'message': 'Profile updated successfully', 'user': user})
 
 @app.route('/api/auth/profile/photo', methods=['POST'])
 def upload_profile_photo():
     if not users:
         return jsonify({'error': 'No user found'}), 404
-    user = users[0]
+    user = users.first()
     if 'photo' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     file = request.files['photo']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
-    filename = f"user_{user['id']}_profile_{datetime.utcnow().timestamp()}_{file.filename}"
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
-    user['profile_photo'] = f'/api/uploads/{filename}'
-    return jsonify({'message': 'Profile photo uploaded', 'profile_photo': user['profile_photo']})
+    user_id = user['id']
+
+    def processed(names):
+        # Only a successfully written avatar becomes the profile photo
+        users.update(user_id, {'profile_photo': f'/api/uploads/{names[AVATAR_SIZES[-1]]}'})
+
+    try:
+        names = photo_processor.submit(file.read(), file.filename, processed)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # The URL is known from the content hash before the avatar is written
+    return jsonify({
+        'message': 'Profile photo uploaded',
+        'profile_photo': f'/api/uploads/{names[AVATAR_SIZES[-1]]}',
+        'sizes': {str(size): f'/api/uploads/{name}' for size, name in names.items()}
+    }), 202
 
 @app.route('/api/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    if not filename.startswith('avatar_'):
+        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Content-addressed avatars never change, so clients may cache them forever
+    photo_processor.wait(filename)
+    response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     data = request.get_json()
     if not data.get('username') or not data.get('password'):
         return jsonify({'error': 'Username and password required'}), 400
+    if not isinstance(data['username'], str):
+        return jsonify({'error': 'username must be a string'}), 400
     # For demo, just check username exists (no real password check)
-    user = next((u for u in users if u['username'] == data['username']), None)
+    user = users.get_by('username', data['username'])
     if not user:
         return jsonify({'error': 'Invalid credentials'}), 401
     return jsonify({
@@ -242,73 +526,123 @@ def login():
     })
 
 @app.route('/api/skills', methods=['GET'])
+@reads_store
+@cached(response_cache, skills, users, skill_ratings)
 def get_skills():
-    """Get all available skills with optional filtering"""
+    """Get all available skills with optional filtering and sort=rating"""
     category = request.args.get('category')
     level = request.args.get('level')
     location = request.args.get('location')
     search = request.args.get('search')
+    sort = request.args.get('sort')
+    if sort not in (None, 'rating'):
+        return jsonify({'error': 'sort must be rating'}), 400
+    try:
+        limit, after, fields = parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    filtered_skills = skills.copy()
-    
+    # Facet filters are intersections of the maintained id sets, smallest first
+    facet_ids = []
     if category:
-        filtered_skills = [s for s in filtered_skills if s['category'].lower() == category.lower()]
+        facet_ids.append(skill_categories.ids(category))
     if level:
-        filtered_skills = [s for s in filtered_skills if s['proficiency_level'].lower() == level.lower()]
+        facet_ids.append(skill_levels.ids(level))
     if location:
-        filtered_skills = [s for s in filtered_skills if location.lower() in s['location'].lower()]
+        facet_ids.append(skill_locations.ids_containing(location))
+    matching = set.intersection(*sorted(facet_ids, key=len)) if facet_ids else None
+    
     if search:
-        search_lower = search.lower()
-        filtered_skills = [s for s in filtered_skills if 
-                          search_lower in s['title'].lower() or 
-                          search_lower in s['description'].lower() or
-                          any(search_lower in tag.lower() for tag in s['tags'])]
+        # Ranked by relevance (or rating); facet filters keep that order. A search
+        # with no word characters matches nothing rather than everything
+        ranked = skill_search.ranked(search)
+        if matching is not None:
+            ranked = [(sid, score) for sid, score in ranked if sid in matching]
+        scores = dict(ranked)
+        if sort == 'rating':
+            key = lambda s: skill_ratings.sort_key(s['id'])
+            rows = sorted((skills.get(sid) for sid, _ in ranked), key=key)
+        else:
+            rows = (skills.get(sid) for sid, _ in ranked)
+            key = lambda s: [-scores[s['id']], s['id']]
+    elif sort == 'rating':
+        key = lambda s: skill_ratings.sort_key(s['id'])
+        if matching is not None:
+            rows = sorted((skills.get(sid) for sid in matching), key=key)
+        else:
+            # Rated skills best first from the maintained order, then unrated ones by id
+            rated = (skills.get(sid) for sid in skill_ratings.ranked(after) if sid in skills)
+            unrated = (s for s in skills.after(after[-1] if after and after[0] == 0 else 0)
+                       if s['id'] not in skill_ratings)
+            rows = itertools.chain(rated, unrated)
+    elif matching is not None:
+        rows = (skills.get(sid) for sid in sorted(matching))
+        key = record_key
+    else:
+        rows = skills.after(after[0] if after else 0)
+        key = record_key
+    filtered_skills, next_cursor = paginate(metrics.count_rows(rows), key, limit, after)
+    metrics.note_rows(len(filtered_skills), 'joined')
     
-    # Add user information to each skill
-    for skill in filtered_skills:
-        user = next((u for u in users if u['id'] == skill['user_id']), None)
-        if user:
-            skill['user'] = {
-                'id': user['id'],
-                'first_name': user['first_name'],
-                'last_name': user['last_name'],
-                'location': user['location'],
-                'profile_photo': user['profile_photo']
-            }
+    # Resolve each owner once and attach user information to the skills
+    owners = users.get_many(s['user_id'] for s in filtered_skills)
+    if fields is None:
+        def encode(skill):
+            extra = {'rating': json_dumps(skill_ratings.summary(skill['id']))}
+            if skill['user_id'] in owners:
+                extra['user'] = owner_json.get(owners[skill['user_id']])
+            return extend_object(skill_json.get(skill), extra)
+        return list_response(filtered_skills, next_cursor, fields, encode)
     
-    return jsonify(filtered_skills)
+    results = []
+    for skill in filtered_skills:
+        item = skill.copy()
+        item['rating'] = skill_ratings.summary(skill['id'])
+        if skill['user_id'] in owners:
+            item['user'] = user_summary(owners[skill['user_id']])
+        results.append(item)
+    return list_response(results, next_cursor, fields)
 
 @app.route('/api/skills/categories', methods=['GET'])
+@reads_store
+@cached(response_cache, skills)
 def get_categories():
     """Get all available skill categories"""
-    categories = list(set(skill['category'] for skill in skills))
-    return jsonify(categories)
+    return jsonify(skill_categories.values())
 
 @app.route('/api/skills/levels', methods=['GET'])
+@reads_store
+@cached(response_cache, skills)
 def get_levels():
     """Get all available proficiency levels"""
-    levels = list(set(skill['proficiency_level'] for skill in skills))
-    return jsonify(levels)
+    return jsonify(skill_levels.values())
+
+@app.route('/api/skills/facets', methods=['GET'])
+@reads_store
+def get_facets():
+    """Get skill counts per category, proficiency level and location"""
+    return jsonify({
+        'categories': skill_categories.counts(),
+        'levels': skill_levels.counts(),
+        'locations': skill_locations.counts()
+    })
 
 @app.route('/api/skills/<int:skill_id>', methods=['GET'])
+@reads_store
+@cached(response_cache, skills, users, skill_ratings, user_ratings)
 def get_skill(skill_id):
     """Get a specific skill by ID"""
-    skill = next((s for s in skills if s['id'] == skill_id), None)
+    skill = skills.get(skill_id)
     if not skill:
         return jsonify({'error': 'Skill not found'}), 404
     
     # Add user information
-    user = next((u for u in users if u['id'] == skill['user_id']), None)
+    skill = skill.copy()
+    skill['rating'] = skill_ratings.summary(skill_id)
+    user = users.get(skill['user_id'])
     if user:
-        skill['user'] = {
-            'id': user['id'],
-            'first_name': user['first_name'],
-            'last_name': user['last_name'],
-            'location': user['location'],
-            'profile_photo': user['profile_photo'],
-            'bio': user['bio'],
-            'availability': user['availability']
-        }
+        skill['user'] = dict(user_summary(user), bio=user['bio'], availability=user['availability'],
+                             rating=user_ratings.summary(user['id']))
     
     return jsonify(skill)
 
@@ -319,23 +653,13 @@ def create_skill():
         return jsonify({'error': 'No user found'}), 404
     
     data = request.get_json()
-    user = users[0]  # Current user
-    
-    skill = {
-        'id': len(skills) + 1,
-        'user_id': user['id'],
-        'title': data['title'],
-        'description': data['description'],
-        'category': data['category'],
-        'proficiency_level': data['proficiency_level'],
-        'hourly_rate': data.get('hourly_rate', 0),
-        'location': data.get('location', user['location']),
-        'availability': data.get('availability', user['availability']),
-        'tags': data.get('tags', []),
-        'created_at': datetime.utcnow().isoformat()
-    }
+    user = users.first()  # Current user
     
-    skills.append(skill)
+    try:
+        skill = dict(new_skill(data, user), id=skills.next_id())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    skills.insert(skill)
     return jsonify({'message': 'Skill created successfully', 'skill': skill}), 201
 
 @app.route('/api/swap-requests', methods=['POST'])
@@ -345,10 +669,10 @@ def create_swap_request():
         return jsonify({'error': 'No user found'}), 404
     
     data = request.get_json()
-    user = users[0]  # Current user
+    user = users.first()  # Current user
     
     request_data = {
-        'id': len(swap_requests) + 1,
+        'id': swap_requests.next_id(),
         'from_user_id': user['id'],
         'to_user_id': data['to_user_id'],
         'skill_id': data['skill_id'],
@@ -357,71 +681,115 @@ def create_swap_request():
         'created_at': datetime.utcnow().isoformat()
     }
     
-    swap_requests.append(request_data)
+    swap_requests.insert(request_data)
+    publish_swap('created', request_data)
     return jsonify({'message': 'Swap request sent successfully', 'request': request_data}), 201
 
 @app.route('/api/swap-requests', methods=['GET'])
+@reads_store
 def get_swap_requests():
-    """Get swap requests for current user"""
+    """Get swap requests for current user, optionally by direction (incoming/outgoing) and status"""
     if not users:
         return jsonify({'error': 'No user found'}), 404
+    direction = request.args.get('direction')
+    if direction not in (None, 'incoming', 'outgoing'):
+        return jsonify({'error': 'direction must be incoming or outgoing'}), 400
     
-    user = users[0]
-    user_requests = [r for r in swap_requests if r['to_user_id'] == user['id'] or r['from_user_id'] == user['id']]
-    
-    # Add user and skill information
-    for req in user_requests:
-        from_user = next((u for u in users if u['id'] == req['from_user_id']), None)
-        to_user = next((u for u in users if u['id'] == req['to_user_id']), None)
-        skill = next((s for s in skills if s['id'] == req['skill_id']), None)
-        
-        if from_user:
-            req['from_user'] = {'first_name': from_user['first_name'], 'last_name': from_user['last_name']}
-        if to_user:
-            req['to_user'] = {'first_name': to_user['first_name'], 'last_name': to_user['last_name']}
-        if skill:
-            req['skill'] = {'title': skill['title'], 'category': skill['category']}
+    user = users.first()
+    user_requests = [swap_requests.get(rid) for rid in swap_inbox.ids(user['id'], direction, request.args.get('status'))]
     
-    return jsonify(user_requests)
+    return jsonify(join_swaps(user_requests))
+
+@app.route('/api/swap-requests/counts', methods=['GET'])
+@reads_store
+def get_swap_counts():
+    """Get the current user's incoming/outgoing swap request counts per status"""
+    if not users:
+        return jsonify({'error': 'No user found'}), 404
+    return jsonify(swap_inbox.counts(users.first()['id']))
+
+@app.route('/api/dashboard', methods=['GET'])
+@reads_store
+@cached(response_cache, users, skills, swap_requests, platform_messages)
+def get_dashboard():
+    """Everything the dashboard page shows, in one request: counts, recent swaps, own skills and announcements"""
+    if not users:
+        return jsonify({'error': 'No user found'}), 404
+    user = users.first()
+    swap_ids = swap_inbox.ids(user['id'])
+    own_skills = skills.get_many(skill_owners.ids(user['id']))
+    recent = [swap_requests.get(rid) for rid in reversed(swap_ids[-DASHBOARD_RECENT_SWAPS:])]
+    return jsonify({
+        'counts': dict(swap_inbox.counts(user['id']),
+                       skills=len(own_skills),
+                       swaps=len(swap_ids),
+                       feedback=sum(1 for rid in swap_ids if swap_requests.get(rid).get('feedback'))),
+        'rating': user_ratings.summary(user['id']),
+        'recent_swaps': join_swaps(recent),
+        'skills': [own_skills[sid].copy() for sid in sorted(own_skills)],
+        'messages': platform_messages.last(DASHBOARD_MESSAGES)
+    })
 
 @app.route('/api/swap-requests/<int:request_id>/accept', methods=['POST'])
 def accept_swap_request(request_id):
-    req = next((r for r in swap_requests if r['id'] == request_id), None)
+    req = swap_requests.get(request_id)
     if not req:
         return jsonify({'error': 'Request not found'}), 404
-    req['status'] = 'accepted'
+    swap_requests.update(request_id, {'status': 'accepted'})
+    publish_swap('accepted', req)
     return jsonify({'message': 'Swap request accepted', 'request': req})
 
 @app.route('/api/swap-requests/<int:request_id>/reject', methods=['POST'])
 def reject_swap_request(request_id):
-    req = next((r for r in swap_requests if r['id'] == request_id), None)
+    req = swap_requests.get(request_id)
     if not req:
         return jsonify({'error': 'Request not found'}), 404
-    req['status'] = 'rejected'
+    swap_requests.update(request_id, {'status': 'rejected'})
+    publish_swap('rejected', req)
     return jsonify({'message': 'Swap request rejected', 'request': req})
 
 @app.route('/api/swap-requests/<int:request_id>', methods=['DELETE'])
 def delete_swap_request(request_id):
-    global swap_requests
-    before = len(swap_requests)
-    swap_requests = [r for r in swap_requests if r['id'] != request_id]
-    after = len(swap_requests)
-    if before == after:
+    req = swap_requests.delete(request_id)
+    if req is None:
         return jsonify({'error': 'Request not found'}), 404
+    publish_swap('deleted', req)
     return jsonify({'message': 'Swap request deleted'})
 
 @app.route('/api/swap-requests/<int:request_id>/feedback', methods=['POST'])
 def leave_feedback(request_id):
-    req = next((r for r in swap_requests if r['id'] == request_id), None)
+    req = swap_requests.get(request_id)
     if not req:
         return jsonify({'error': 'Request not found'}), 404
     data = request.get_json()
-    req['feedback'] = data.get('feedback', '')
-    req['rating'] = data.get('rating', None)
-    req['status'] = 'completed'
+    try:
+        rating = parse_rating(data.get('rating'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    swap_requests.update(request_id, {
+        'feedback': data.get('feedback', ''),
+        'rating': rating,
+        'status': 'completed'
+    })
+    publish_swap('completed', req)
     return jsonify({'message': 'Feedback submitted', 'request': req})
 
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    """Server-sent events with the current user's swap request changes and platform messages.
+
+    Events are published in the process that handled the write, so with
+    several workers a client only hears about writes made through its own.
+    """
+    if not users:
+        return jsonify({'error': 'No user found'}), 404
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = events.subscribe(users.first()['id'], last_event_id)
+    return Response(events.stream(subscription), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/users/search', methods=['GET'])
+@reads_store
 def search_users():
     """Search public users by skills offered/wanted, availability, and location"""
     skill = request.args.get('skill', '').lower()
@@ -429,163 +797,360 @@ def search_users():
     offered = request.args.get('offered', '').lower()
     availability = request.args.get('availability', '').lower()
     location = request.args.get('location', '').lower()
+    try:
+        limit, after, fields = parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Each filter is a substring match on one or more indexes (any may match).
+    # The most selective filter streams its ids in order from the cursor; the
+    # rest are checked per candidate against the values they match, and the
+    # scan stops once a page is full.
+    criteria = []
+    if skill:
+        criteria.append([(offered_skills, skill), (wanted_skills, skill)])
+    if offered:
+        criteria.append([(offered_skills, offered)])
+    if wanted:
+        criteria.append([(wanted_skills, wanted)])
+    if availability:
+        criteria.append([(user_availability, availability)])
+    if location:
+        criteria.append([(user_locations, location)])
+    if criteria:
+        criteria.sort(key=lambda options: sum(index.count_containing(text) for index, text in options))
+        start = after[0] if after else 0
+        matching = merge_ids(*(index.iter_ids(text, start) for index, text in criteria[0]))
+        for options in criteria[1:]:
+            matchers = [index.matcher(text) for index, text in options]
+            check = matchers[0] if len(matchers) == 1 else lambda uid, matchers=matchers: any(m(uid) for m in matchers)
+            matching = filter(check, matching)
+        rows = map(users.get, matching)
+    else:
+        rows = users.after(after[0] if after else 0)
+    rows = (u for u in rows if u.get('is_public', True))
+
+    # Only return public info; the scan stops once a page is full
+    page, next_cursor = paginate(metrics.count_rows(rows), record_key, limit, after)
+    if fields is None:
+        encode = lambda u: extend_object(public_profile_json.get(u), {'rating': json_dumps(user_ratings.summary(u['id']))})
+        return list_response(page, next_cursor, fields, encode)
+    return list_response([dict(public_profiles.get(u), rating=user_ratings.summary(u['id'])) for u in page],
+                         next_cursor, fields)
+
+@app.route('/api/users/matches', methods=['GET'])
+@reads_store
+def get_matches():
+    """Recommend swap partners who offer what the current user wants and want what they offer"""
+    if not users:
+        return jsonify({'error': 'No user found'}), 404
+    user = users.first()
+    limit = request.args.get('limit', 10, type=int)
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+
+    def eligible(user_id):
+        other = users.get(user_id)
+        return other is not None and other.get('is_public', True) and not other.get('banned')
 
     results = []
-    for user in users:
-        if not user.get('is_public', True):
-            continue
-        # Filter by skill (offered or wanted)
-        if skill:
-            if not (any(skill in s.lower() for s in user.get('skills_offered', [])) or any(skill in s.lower() for s in user.get('skills_wanted', []))):
-                continue
-        if offered:
-            if not any(offered in s.lower() for s in user.get('skills_offered', [])):
-                continue
-        if wanted:
-            if not any(wanted in s.lower() for s in user.get('skills_wanted', [])):
-                continue
-        if availability:
-            if availability not in user.get('availability', '').lower():
-                continue
-        if location:
-            if location not in user.get('location', '').lower():
-                continue
-        # Only return public info
-        results.append({
-            'id': user['id'],
-            'first_name': user['first_name'],
-            'last_name': user['last_name'],
-            'location': user['location'],
-            'profile_photo': user['profile_photo'],
-            'availability': user['availability'],
-            'skills_offered': user['skills_offered'],
-            'skills_wanted': user['skills_wanted'],
-            'bio': user['bio'],
-            'is_public': user['is_public']
-        })
+    for user_id, score, they_offer, they_want in skill_matches.matches(user['id'], min(limit, MAX_LIMIT), eligible):
+        item = dict(public_profiles.get(users.get(user_id)), rating=user_ratings.summary(user_id))
+        item['match'] = {'score': score, 'they_offer': they_offer, 'they_want': they_want}
+        results.append(item)
     return jsonify(results)
 
 @app.route('/api/admin/skills', methods=['GET'])
+@reads_store
 def admin_list_skills():
     # Only allow admin (for demo, user 1 is admin)
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    return jsonify(skills)
+    try:
+        limit, after, fields = parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    page, next_cursor = paginate(metrics.count_rows(skills.after(after[0] if after else 0)), record_key, limit, after)
+    return list_response(page, next_cursor, fields, skill_json.get)
 
 @app.route('/api/admin/skills/<int:skill_id>/reject', methods=['POST'])
 def admin_reject_skill(skill_id):
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    global skills
-    before = len(skills)
-    skills = [s for s in skills if s['id'] != skill_id]
-    after = len(skills)
-    if before == after:
+    if skills.delete(skill_id) is None:
         return jsonify({'error': 'Skill not found'}), 404
     return jsonify({'message': 'Skill rejected/deleted'})
 
 @app.route('/api/admin/users', methods=['GET'])
+@reads_store
 def admin_list_users():
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    return jsonify(users)
+    try:
+        limit, after, fields = parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    page, next_cursor = paginate(metrics.count_rows(users.after(after[0] if after else 0)), record_key, limit, after)
+    return list_response(page, next_cursor, fields, user_json.get)
 
 @app.route('/api/admin/users/<int:user_id>/ban', methods=['POST'])
 def admin_ban_user(user_id):
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    user = next((u for u in users if u['id'] == user_id), None)
+    user = users.get(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
-    user['banned'] = True
+    users.update(user_id, {'banned': True})
     return jsonify({'message': 'User banned'})
 
 @app.route('/api/admin/users/<int:user_id>/unban', methods=['POST'])
 def admin_unban_user(user_id):
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    user = next((u for u in users if u['id'] == user_id), None)
+    user = users.get(user_id)
     if not user:
         return jsonify({'error': 'User not found'}), 404
-    user['banned'] = False
+    users.update(user_id, {'banned': False})
     return jsonify({'message': 'User unbanned'})
 
+@app.route('/api/admin/analytics', methods=['GET'])
+@reads_store
+def admin_analytics():
+    """Swaps by status, new skills by category and registrations per day, plus ban counts"""
+    if not users or not users.first().get('is_admin'):
+        return jsonify({'error': 'Admin only'}), 403
+    try:
+        days = parse_days(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    banned = registrations.count(True)
+    return jsonify({
+        'since': days[0],
+        'days': len(days),
+        'swaps': {
+            'by_status': swap_activity.between(days),
+            'all_time_by_status': swap_activity.totals(),
+            'daily': swap_activity.daily(days)
+        },
+        'skills': {
+            'by_category': skill_activity.between(days),
+            'all_time_by_category': skill_activity.totals(),
+            'daily': skill_activity.daily(days)
+        },
+        'registrations': {
+            'total': sum(registrations.between(days).values()),
+            'all_time': len(users),
+            'daily': [{'date': day['date'], 'count': day['total']} for day in registrations.daily(days)]
+        },
+        'bans': {'banned': banned, 'active': len(users) - banned}
+    })
+
 @app.route('/api/admin/swaps', methods=['GET'])
+@reads_store
 def admin_list_swaps():
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    return jsonify(swap_requests)
+    try:
+        limit, after, fields = parse_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    page, next_cursor = paginate(metrics.count_rows(swap_requests.after(after[0] if after else 0)), record_key, limit, after)
+    return list_response(page, next_cursor, fields, swap_json.get)
 
 @app.route('/api/admin/messages', methods=['POST'])
 def admin_send_message():
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
     data = request.get_json()
     msg = {
-        'id': len(platform_messages) + 1,
+        'id': platform_messages.next_id(),
         'message': data.get('message', ''),
         'created_at': datetime.utcnow().isoformat()
     }
-    platform_messages.append(msg)
+    platform_messages.insert(msg)
+    events.publish('platform_message', msg)
     return jsonify({'message': 'Platform message sent', 'msg': msg})
 
 @app.route('/api/admin/messages', methods=['GET'])
+@reads_store
 def admin_get_messages():
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    return jsonify(platform_messages)
+    return jsonify(list(platform_messages))
+
+def attachment(chunks, mimetype, filename):
+    """Stream text chunks as a download, compressed when the client accepts it"""
+    headers = {'Content-Disposition': f'attachment;filename={filename}', 'Vary': 'Accept-Encoding'}
+    encoding = compression.negotiate()
+    if encoding is not None:
+        chunks = compression.stream(chunks, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(chunks, mimetype=mimetype, headers=headers)
+
+def csv_report(fieldnames, rows, filename):
+    """Stream rows as a CSV attachment"""
+    # Plain dict copies make the writer's per-field lookups C dict lookups
+    rows = (row.copy() for row in metrics.count_rows(rows))
+    return attachment(csv_chunks(fieldnames, rows), 'text/csv', filename)
 
 @app.route('/api/admin/report/users', methods=['GET'])
+@reads_store
 def admin_report_users():
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    si = StringIO()
-    writer = csv.DictWriter(si, fieldnames=list(users[0].keys()))
-    writer.writeheader()
-    for u in users:
-        writer.writerow(u)
-    output = si.getvalue()
-    return Response(output, mimetype='text/csv', headers={'Content-Disposition': 'attachment;filename=users_report.csv'})
+    try:
+        in_range = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = (u for u in users.after() if in_range(u['created_at']))
+    return csv_report(list(users.first().keys()), rows, 'users_report.csv')
 
 @app.route('/api/admin/report/feedback', methods=['GET'])
+@reads_store
 def admin_report_feedback():
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    si = StringIO()
-    writer = csv.DictWriter(si, fieldnames=['id','from_user_id','to_user_id','skill_id','feedback','rating','created_at'])
-    writer.writeheader()
-    for r in swap_requests:
-        if r.get('feedback'):
-            writer.writerow({
-                'id': r['id'],
-                'from_user_id': r['from_user_id'],
-                'to_user_id': r['to_user_id'],
-                'skill_id': r['skill_id'],
-                'feedback': r.get('feedback',''),
-                'rating': r.get('rating',''),
-                'created_at': r['created_at']
-            })
-    output = si.getvalue()
-    return Response(output, mimetype='text/csv', headers={'Content-Disposition': 'attachment;filename=feedback_report.csv'})
+    try:
+        in_range = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Only swaps with feedback are visited, in id order
+    rows = (r for r in (swap_requests.get(rid) for rid in swap_feedback.ids()) if r and in_range(r['created_at']))
+    return csv_report(FEEDBACK_REPORT_FIELDS, rows, 'feedback_report.csv')
 
 @app.route('/api/admin/report/swaps', methods=['GET'])
+@reads_store
 def admin_report_swaps():
-    if not users or not users[0].get('is_admin'):
+    if not users or not users.first().get('is_admin'):
         return jsonify({'error': 'Admin only'}), 403
-    si = StringIO()
-    writer = csv.DictWriter(si, fieldnames=list(swap_requests[0].keys()) if swap_requests else ['id','from_user_id','to_user_id','skill_id','status','created_at'])
-    writer.writeheader()
-    for r in swap_requests:
-        writer.writerow(r)
-    output = si.getvalue()
-    return Response(output, mimetype='text/csv', headers={'Content-Disposition': 'attachment;filename=swaps_report.csv'})
+    try:
+        in_range = parse_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = (r for r in swap_requests.after() if in_range(r['created_at']))
+    return csv_report(SWAP_REPORT_FIELDS, rows, 'swaps_report.csv')
 
-if __name__ == '__main__':
-    # Add demo users and skills for testing
+def require(data, fields):
+    missing = [field for field in fields if field not in data]
+    if missing:
+        raise ValueError('Missing required fields: ' + ', '.join(missing))
+
+def imported_timestamp(record, data):
+    """Keep an imported record's created_at if it is a valid ISO timestamp"""
+    if data.get('created_at'):
+        record['created_at'] = datetime.fromisoformat(data['created_at']).isoformat()
+    return record
+
+def import_user(data):
+    require(data, ('username', 'email', 'first_name', 'last_name'))
+    return imported_timestamp(new_user(data), data)
+
+def import_skill(data):
+    require(data, ('user_id', 'title', 'description', 'category', 'proficiency_level'))
+    owner = users.get(data['user_id'])
+    if owner is None:
+        raise ValueError(f'Unknown user_id {data["user_id"]}')
+    return imported_timestamp(new_skill(data, owner), data)
+
+def import_swap(data):
+    require(data, ('from_user_id', 'to_user_id', 'skill_id'))
+    for field, collection in (('from_user_id', users), ('to_user_id', users), ('skill_id', skills)):
+        if data[field] not in collection:
+            raise ValueError(f'Unknown {field} {data[field]}')
+    if data.get('status', 'pending') not in STATUSES:
+        raise ValueError('status must be one of ' + ', '.join(STATUSES))
+    rating = parse_rating(data.get('rating'))
+    swap = {
+        'from_user_id': data['from_user_id'],
+        'to_user_id': data['to_user_id'],
+        'skill_id': data['skill_id'],
+        'message': data.get('message', ''),
+        'status': data.get('status', 'pending'),
+        'created_at': datetime.utcnow().isoformat()
+    }
+    if 'feedback' in data:
+        swap['feedback'] = data['feedback']
+    if 'rating' in data:
+        swap['rating'] = rating
+    return imported_timestamp(swap, data)
+
+def import_message(data):
+    require(data, ('message',))
+    return imported_timestamp({'message': data['message'], 'created_at': datetime.utcnow().isoformat()}, data)
+
+# Collection, record builder and CSV column types for each importable collection, in dependency order
+IMPORTS = {
+    'users': (users, import_user, {'id': int, 'is_public': bool, 'is_admin': bool, 'banned': bool,
+                                   'skills_offered': list, 'skills_wanted': list}),
+    'skills': (skills, import_skill, {'id': int, 'user_id': int, 'hourly_rate': number, 'tags': list}),
+    'swap_requests': (swap_requests, import_swap, {'id': int, 'from_user_id': int, 'to_user_id': int,
+                                                   'skill_id': int, 'rating': number}),
+    'platform_messages': (platform_messages, import_message, {'id': int}),
+}
+
+def import_summary(results, started):
+    summary = {'imported': sum(r['imported'] for r in results), 'skipped': sum(r['skipped'] for r in results),
+               'errors': [error for r in results for error in r['errors']][:MAX_ERRORS]}
+    summary['records_per_second'] = round(summary['imported'] / max(time.perf_counter() - started, 1e-9))
+    return summary
+
+@app.route('/api/admin/import/<name>', methods=['POST'])
+def admin_import(name):
+    """Bulk-load one collection from NDJSON, or CSV with a header line"""
+    if not users or not users.first().get('is_admin'):
+        return jsonify({'error': 'Admin only'}), 403
+    if name not in IMPORTS:
+        return jsonify({'error': 'Unknown collection'}), 404
+    collection, build, types = IMPORTS[name]
+    started = time.perf_counter()
+    lines = decode_lines(request.stream)
+    rows = read_csv(lines, types) if request.mimetype == 'text/csv' else read_ndjson(lines)
+    return jsonify(import_summary([import_records(collection, rows, build)], started))
+
+@app.route('/api/admin/import', methods=['POST'])
+def admin_import_dump():
+    """Bulk-load the NDJSON written by /api/admin/export"""
+    if not users or not users.first().get('is_admin'):
+        return jsonify({'error': 'Admin only'}), 403
+    started = time.perf_counter()
+
+    def target(row):
+        data = row[1]
+        return data.get('collection') if isinstance(data, dict) else None
+
+    results = []
+    # Consecutive lines of one collection are imported together; the export writes each collection in one run
+    for name, group in itertools.groupby(read_ndjson(decode_lines(request.stream)), target):
+        if name not in IMPORTS:
+            skipped = {'imported': 0, 'skipped': 0, 'errors': []}
+            for line, data in group:
+                skipped['skipped'] += 1
+                if len(skipped['errors']) < MAX_ERRORS:
+                    error = str(data) if isinstance(data, ValueError) else 'Unknown collection'
+                    skipped['errors'].append({'line': line, 'error': error})
+            results.append(skipped)
+            continue
+        collection, build, _ = IMPORTS[name]
+        rows = ((line, data['record'] if isinstance(data.get('record'), dict) else ValueError('Expected a record object'))
+                for line, data in group)
+        results.append(import_records(collection, rows, build))
+    return jsonify(import_summary(results, started))
+
+@app.route('/api/admin/export', methods=['GET'])
+@reads_store
+def admin_export():
+    """Stream every collection as NDJSON lines of {"collection", "record"}"""
+    if not users or not users.first().get('is_admin'):
+        return jsonify({'error': 'Admin only'}), 403
+    rows = ({'collection': name, 'record': record} for name, (collection, _, _) in IMPORTS.items()
+            for record in collection.after())
+    return attachment(ndjson_chunks(metrics.count_rows(rows)), 'application/x-ndjson', 'skill_swap.ndjson')
+
+def seed_demo_data():
+    """Add demo users, skills and swap requests for testing"""
     users.extend(demo_users)
     skills.extend(demo_skills)
-    # Add demo swap requests for testing
-    swap_requests.append({
+    swap_requests.insert({
         'id': 1,
         'from_user_id': 2,  # Sarah Designer
         'to_user_id': 1,    # Demo User
@@ -594,7 +1159,7 @@ if __name__ == '__main__':
         'status': 'pending',
         'created_at': datetime.utcnow().isoformat()
     })
-    swap_requests.append({
+    swap_requests.insert({
         'id': 2,
         'from_user_id': 3,  # Mike Analyst
         'to_user_id': 1,    # Demo User
@@ -603,6 +1168,11 @@ if __name__ == '__main__':
         'status': 'accepted',
         'created_at': datetime.utcnow().isoformat()
     })
+
+if __name__ == '__main__':
+    # A persistent store keeps its data between runs, so only seed an empty one
+    if not users:
+        seed_demo_data()
     print("🚀 Backend running at http://localhost:5000")
     print(f"📊 Loaded {len(users)} users and {len(skills)} skills")
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
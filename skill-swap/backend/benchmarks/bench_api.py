@@ -0,0 +1,247 @@
+"""Latency/throughput benchmark for the Flask API at configurable data scales.
+
+Seeds the in-memory users, skills and swap_requests with generated records
+modelled on the demo data, drives the key endpoints and prints one JSON
+document (p50/p99 latency, throughput, response size, peak RSS) that can be
+diffed between commits.
+
+Run from the backend directory, for example:
+    python benchmarks/bench_api.py --scale 1k
+    python benchmarks/bench_api.py --scale 100k --requests 200 --output bench_100k.json
+    python benchmarks/bench_api.py --scale 1k --server   # through a local WSGI server
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.environ.pop('SKILL_SWAP_DB', None)  # always benchmark the in-memory store
+
+import app as skill_swap  # noqa: E402
+
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000, '1m': 1000000}
+
+CATEGORIES = ['Programming', 'Design', 'Business', 'Language', 'Music', 'Cooking', 'Fitness', 'Photography']
+LEVELS = ['Beginner', 'Intermediate', 'Expert', 'Native']
+AVAILABILITY = ['weekdays', 'weekends', 'evenings', 'flexible', 'always']
+SKILL_NAMES = ['Python', 'JavaScript', 'Graphic Design', 'Photoshop', 'Excel', 'Data Analysis', 'Spanish',
+               'French', 'Guitar', 'Piano', 'Baking', 'Yoga', 'Photography', 'Marketing', 'Web Design', 'SQL']
+STATUSES = ['pending', 'accepted', 'rejected', 'completed']
+
+# (name, path) pairs; several variants per endpoint so cached responses do not hide the work
+ENDPOINTS = [
+    ('skills_all', ['/api/skills?limit=50', '/api/skills?limit=50&fields=id,title,user']),
+    ('skills_filtered', ['/api/skills?category=Design&level=Expert', '/api/skills?category=Music&location=city 1',
+                         '/api/skills?level=Native&location=city 42']),
+    ('skills_search', ['/api/skills?search=python', '/api/skills?search=des&limit=20', '/api/skills?search=data analysis']),
+    ('users_search', ['/api/users/search?skill=design&limit=20', '/api/users/search?offered=python&location=city 7',
+                      '/api/users/search?wanted=span&availability=week&limit=50']),
+    ('swap_requests', ['/api/swap-requests', '/api/swap-requests?status=pending']),
+    ('dashboard', ['/api/dashboard']),
+    ('admin_lists', ['/api/admin/skills?limit=500', '/api/admin/users?limit=500', '/api/admin/swaps?limit=500']),
+    ('admin_analytics', ['/api/admin/analytics', '/api/admin/analytics?since=2025-01-01&until=2026-01-01']),
+    ('report_users', ['/api/admin/report/users']),
+    ('report_swaps', ['/api/admin/report/swaps']),
+    ('report_feedback', ['/api/admin/report/feedback']),
+]
+
+
+def generate_users(count, rng):
+    start = datetime(2025, 1, 1)
+    for i in range(1, count + 1):
+        yield {
+            'id': i,
+            'username': f'user{i}',
+            'email': f'user{i}@example.com',
+            'first_name': f'First{i}',
+            'last_name': f'Last{i}',
+            'bio': 'Generated benchmark user with a short biography',
+            'location': f'City {rng.randint(1, 500)}',
+            'profile_photo': '',
+            'availability': rng.choice(AVAILABILITY),
+            'is_public': rng.random() > 0.05,
+            'skills_offered': rng.sample(SKILL_NAMES, 2),
+            'skills_wanted': rng.sample(SKILL_NAMES, 2),
+            'created_at': (start + timedelta(minutes=i)).isoformat(),
+            'is_admin': i == 1,
+            'banned': False
+        }
+
+
+def generate_skills(count, user_count, rng):
+    start = datetime(2025, 1, 1)
+    for i in range(1, count + 1):
+        name = rng.choice(SKILL_NAMES)
+        yield {
+            'id': i,
+            'user_id': rng.randint(1, user_count),
+            'title': f'{name} {rng.choice(["Tutoring", "Coaching", "Basics", "Masterclass"])}',
+            'description': f'Hands-on {name.lower()} sessions covering fundamentals and real projects',
+            'category': rng.choice(CATEGORIES),
+            'proficiency_level': rng.choice(LEVELS),
+            'hourly_rate': rng.randint(10, 60),
+            'location': f'City {rng.randint(1, 500)}',
+            'availability': rng.choice(AVAILABILITY),
+            'tags': rng.sample(SKILL_NAMES, 3),
+            'created_at': (start + timedelta(minutes=i)).isoformat()
+        }
+
+
+def generate_swaps(count, user_count, skill_count, inbox, rng):
+    """Swaps between random users; `inbox` of them involve user 1, the API's current user"""
+    start = datetime(2025, 1, 1)
+    inbox_ids = set(rng.sample(range(1, count + 1), min(inbox, count)))
+    for i in range(1, count + 1):
+        from_user, to_user = rng.randint(2, max(user_count, 2)), rng.randint(2, max(user_count, 2))
+        if i in inbox_ids:
+            from_user, to_user = (1, to_user) if rng.random() < 0.5 else (from_user, 1)
+        swap = {
+            'id': i,
+            'from_user_id': from_user,
+            'to_user_id': to_user,
+            'skill_id': rng.randint(1, skill_count),
+            'message': 'Generated swap request',
+            'status': rng.choice(STATUSES),
+            'created_at': (start + timedelta(minutes=i)).isoformat()
+        }
+        if swap['status'] == 'completed':
+            swap['feedback'] = 'Great session'
+            swap['rating'] = rng.randint(1, 5)
+        yield swap
+
+
+def seed(rows, inbox, rng):
+    started = time.perf_counter()
+    skill_swap.users.extend(generate_users(rows, rng))
+    skill_swap.skills.extend(generate_skills(rows, rows, rng))
+    skill_swap.swap_requests.extend(generate_swaps(rows, rows, rows, inbox, rng))
+    return time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def test_client_fetch(headers):
+    client = skill_swap.app.test_client()
+
+    def fetch(path):
+        response = client.get(path, headers=headers)
+        return response.status_code, len(response.get_data())
+    return fetch, lambda: None
+
+
+def server_fetch(headers):
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, skill_swap.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    def fetch(path):
+        with urllib.request.urlopen(urllib.request.Request(base + path.replace(' ', '%20'), headers=headers)) as response:
+            return response.status, len(response.read())
+    return fetch, server.shutdown
+
+
+def run_endpoint(fetch, paths, requests, cold):
+    latencies = []
+    sizes = 0
+    started = time.perf_counter()
+    for i in range(requests):
+        if cold:
+            skill_swap.response_cache.clear()
+        path = paths[i % len(paths)]
+        t0 = time.perf_counter()
+        status, size = fetch(path)
+        latencies.append(time.perf_counter() - t0)
+        if status != 200:
+            raise RuntimeError(f'{path} returned {status}')
+        sizes += size
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': requests,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'mean_bytes': sizes // requests
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='1k', help='rows per collection: 1k, 10k, 100k, 1m or a number')
+    parser.add_argument('--requests', type=int, default=100, help='requests per endpoint')
+    parser.add_argument('--inbox', type=int, default=200, help="swap requests involving the current user")
+    parser.add_argument('--endpoints', help='comma-separated subset of: ' + ', '.join(n for n, _ in ENDPOINTS))
+    parser.add_argument('--cold', action='store_true', help='clear the response cache before every request')
+    parser.add_argument('--server', action='store_true', help='go through a local WSGI server instead of the test client')
+    parser.add_argument('--encoding', help='Accept-Encoding to send (e.g. gzip); mean_bytes is then the compressed size')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON report here instead of stdout')
+    args = parser.parse_args()
+
+    rows = SCALES.get(args.scale.lower()) or int(args.scale)
+    rng = random.Random(args.seed)
+    seed_seconds = seed(rows, args.inbox, rng)
+    rss_after_seed = peak_rss_mb()
+
+    selected = set(args.endpoints.split(',')) if args.endpoints else None
+    headers = {'Accept-Encoding': args.encoding} if args.encoding else {}
+    fetch, stop = server_fetch(headers) if args.server else test_client_fetch(headers)
+    results = {}
+    try:
+        for name, paths in ENDPOINTS:
+            if selected is None or name in selected:
+                results[name] = run_endpoint(fetch, paths, args.requests, args.cold)
+    finally:
+        stop()
+
+    report = {
+        'commit': git_commit(),
+        'scale': rows,
+        'mode': 'server' if args.server else 'test_client',
+        'cold_cache': args.cold,
+        'encoding': args.encoding,
+        'seed_seconds': round(seed_seconds, 2),
+        'peak_rss_after_seed_mb': rss_after_seed,
+        'peak_rss_mb': peak_rss_mb(),
+        'endpoints': results
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
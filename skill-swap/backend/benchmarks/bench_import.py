@@ -0,0 +1,94 @@
+"""Records-per-second benchmark for the bulk import and export endpoints.
+
+Generates users, skills and swap requests with the bench_api generators,
+posts them to /api/admin/import/<collection> as NDJSON (and skills again as
+CSV), then streams /api/admin/export. Prints one JSON document.
+
+Run from the backend directory, for example:
+    python benchmarks/bench_import.py --scale 100k
+"""
+import argparse
+import csv
+import io
+import json
+import random
+import sys
+import time
+
+from bench_api import SCALES, generate_skills, generate_swaps, generate_users, git_commit, peak_rss_mb, skill_swap
+
+
+def ndjson(records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def as_csv(records, fieldnames):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+    for record in records:
+        writer.writerow(dict(record, tags=json.dumps(record['tags'])))
+    return buffer.getvalue()
+
+
+def post(client, name, records, encode, mimetype, per_request):
+    """Import records in requests of per_request records, staying under MAX_CONTENT_LENGTH"""
+    imported = size = 0
+    started = time.perf_counter()
+    for i in range(0, len(records), per_request):
+        body = encode(records[i:i + per_request])
+        size += len(body)
+        response = client.post(f'/api/admin/import/{name}', data=body, content_type=mimetype)
+        result = response.get_json()
+        if response.status_code != 200 or result['skipped']:
+            raise RuntimeError(f'{name} import failed: {response.status_code} {result}')
+        imported += result['imported']
+    elapsed = time.perf_counter() - started
+    return {'records': imported, 'seconds': round(elapsed, 3),
+            'records_per_second': round(imported / elapsed), 'bytes': size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='10k', help='rows per collection: 1k, 10k, 100k, 1m or a number')
+    parser.add_argument('--per-request', type=int, default=20000, help='records per import request')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+    rows = SCALES.get(args.scale) or int(args.scale)
+    rng = random.Random(args.seed)
+
+    people = list(generate_users(rows, rng))
+    offers = list(generate_skills(rows, rows, rng))
+    swaps = list(generate_swaps(rows, rows, rows, 0, rng))
+    # The admin has to exist before the import endpoints accept anything
+    skill_swap.users.insert(people[0])
+    client = skill_swap.app.test_client()
+
+    report = {'commit': git_commit(), 'scale': rows, 'imports': {}}
+    imports = report['imports']
+    n = args.per_request
+    imports['users_ndjson'] = post(client, 'users', people[1:], ndjson, 'application/x-ndjson', n)
+    half = len(offers) // 2
+    imports['skills_ndjson'] = post(client, 'skills', offers[:half], ndjson, 'application/x-ndjson', n)
+    fieldnames = list(offers[0])
+    imports['skills_csv'] = post(client, 'skills', offers[half:], lambda part: as_csv(part, fieldnames), 'text/csv', n)
+    imports['swap_requests_ndjson'] = post(client, 'swap_requests', swaps, ndjson, 'application/x-ndjson', n)
+
+    started = time.perf_counter()
+    body = client.get('/api/admin/export').get_data()
+    elapsed = time.perf_counter() - started
+    records = body.count(b'\n')
+    report['export'] = {'records': records, 'seconds': round(elapsed, 3),
+                        'records_per_second': round(records / elapsed), 'bytes': len(body)}
+    report['peak_rss_mb'] = peak_rss_mb()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""Benchmark primary-key and username lookups as the dataset grows.
+
+Run from the backend directory:  python benchmarks/bench_lookup.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import Collection
+
+SIZES = [1000, 10000, 100000, 300000]
+LOOKUPS = 2000
+
+
+def make_users(n):
+    return [{'id': i, 'username': f'user{i}', 'first_name': 'First', 'last_name': 'Last'} for i in range(1, n + 1)]
+
+
+def per_lookup_us(fn, keys):
+    seconds = timeit.timeit(lambda: [fn(k) for k in keys], number=1)
+    return seconds / len(keys) * 1e6
+
+
+def main():
+    print(f"{'users':>8} {'get(id) us':>12} {'get_by(username) us':>20} {'linear scan us':>16}")
+    for n in SIZES:
+        rows = make_users(n)
+        users = Collection('users', unique=('username',))
+        users.extend(rows)
+        ids = [random.randint(1, n) for _ in range(LOOKUPS)]
+        names = [f'user{i}' for i in ids]
+        by_id = per_lookup_us(users.get, ids)
+        by_name = per_lookup_us(lambda name: users.get_by('username', name), names)
+        # The old list scan is O(N); sample only a few keys so large sizes finish
+        linear = per_lookup_us(lambda i: next((u for u in rows if u['id'] == i), None), ids[:20])
+        print(f'{n:>8} {by_id:>12.3f} {by_name:>20.3f} {linear:>16.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Memory per record: plain dicts versus the compact record types in app.py.
+
+Builds the same generated records both ways (as they arrive from JSON, so
+no strings are shared up front) and reports traced bytes per record.
+
+Run from the backend directory, for example:
+    python benchmarks/bench_memory.py --count 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import tracemalloc
+
+from bench_api import generate_skills, generate_swaps, generate_users, skill_swap
+
+
+def measure(build, records):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = [build(json.loads(line)) for line in records]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del built
+    return round(used / len(records))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200000, help='records per collection')
+    args = parser.parse_args()
+    rng = random.Random(1)
+    samples = {
+        'users': (skill_swap.User, generate_users(args.count, rng)),
+        'skills': (skill_swap.Skill, generate_skills(args.count, args.count, rng)),
+        'swap_requests': (skill_swap.SwapRequest, generate_swaps(args.count, args.count, args.count, 0, rng)),
+    }
+    report = {'count': args.count}
+    for name, (record_type, records) in samples.items():
+        lines = [json.dumps(record) for record in records]
+        as_dict = measure(lambda data: data, lines)
+        compact = measure(record_type, lines)
+        report[name] = {'dict_bytes': as_dict, 'record_bytes': compact,
+                        'mb_per_million_dict': round(as_dict / 1.048576, 1),
+                        'mb_per_million_record': round(compact / 1.048576, 1)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Write/recovery benchmark for the write-ahead log backend.
+
+Logs generated users, skills and swap requests through LogBackend, takes a
+snapshot, logs a tail of updates after it, then times a cold recovery in a
+fresh backend (snapshot load + log replay). Prints one JSON document.
+
+Run from the backend directory, for example:
+    python benchmarks/bench_recovery.py --scale 1m --tail 100000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from bench_api import SCALES, generate_skills, generate_swaps, generate_users, git_commit, peak_rss_mb
+
+from journal import LogBackend
+from store import SNAPSHOT_CHUNK
+
+
+def chunks(records):
+    """The records in SNAPSHOT_CHUNK slices, as Collection.chunks() hands them to a snapshot"""
+    for i in range(0, len(records), SNAPSHOT_CHUNK):
+        yield records[i:i + SNAPSHOT_CHUNK]
+
+
+def wait_for_snapshot(backend):
+    while backend._snapshotting:
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', default='100k', help='rows per collection: 1k, 10k, 100k, 1m or a number')
+    parser.add_argument('--tail', type=int, default=10000, help='updates logged after the snapshot')
+    parser.add_argument('--writers', type=int, default=8, help='threads issuing the tail updates')
+    parser.add_argument('--directory', help='data directory (default: a temporary one)')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+    rows = SCALES.get(args.scale) or int(args.scale)
+    rng = random.Random(1)
+    directory = args.directory or tempfile.mkdtemp(prefix='skill-swap-wal-')
+    report = {'commit': git_commit(), 'scale': rows}
+
+    backend = LogBackend(directory, snapshot_every=10 ** 12)
+    data = {
+        'users': list(generate_users(rows, rng)),
+        'skills': list(generate_skills(rows, rows, rng)),
+        'swap_requests': list(generate_swaps(rows, rows, rows, 0, rng)),
+    }
+    started = time.perf_counter()
+    for name, records in data.items():
+        for i in range(0, len(records), 1000):
+            backend.insert_many(name, records[i:i + 1000])
+            backend.flush()
+    report['batched_inserts_per_second'] = round(3 * rows / (time.perf_counter() - started))
+
+    started = time.perf_counter()
+    backend.snapshot({name: chunks(records) for name, records in data.items()})
+    report['snapshot_handoff_seconds'] = round(time.perf_counter() - started, 3)
+    wait_for_snapshot(backend)
+    report['snapshot_seconds'] = round(time.perf_counter() - started, 3)
+
+    # Concurrent single-record writes share fsyncs through group commit
+    swaps = data['swap_requests']
+
+    def write(offset, swaps=swaps):
+        for i in range(offset, args.tail, args.writers):
+            backend.update('swap_requests', dict(swaps[i % len(swaps)], status='accepted'))
+            backend.flush()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report['durable_updates_per_second'] = round(args.tail / (time.perf_counter() - started))
+    backend.close()
+    del data, swaps
+
+    started = time.perf_counter()
+    recovered = LogBackend(directory)
+    counts = {name: len(recovered.load(name)) for name in ('users', 'skills', 'swap_requests')}
+    report['recovery_seconds'] = round(time.perf_counter() - started, 3)
+    report['recovered'] = counts
+    report['disk_mb'] = round(sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 2 ** 20, 1)
+    report['peak_rss_mb'] = peak_rss_mb()
+    recovered.close()
+    if not args.directory:
+        shutil.rmtree(directory)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Multi-threaded stress test for the store: concurrent writers and readers, then consistency checks.
+
+Seeds generated data, then runs writer threads (registrations, including
+racing ones for the same usernames, new skills, swap requests and their
+accept/reject/feedback/delete) alongside reader threads hitting the
+listing, search and inbox endpoints. Afterwards it checks that no write
+was lost or applied twice: every created id is distinct and stored, every
+swap ends in the state its writer left it in, each contested username was
+registered exactly once, and the secondary indexes agree with a scan of
+the records. Prints one JSON document and exits non-zero on any failure.
+
+Run from the backend directory, for example:
+    python benchmarks/stress_threads.py --writers 8 --readers 4 --operations 500
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from bench_api import generate_skills, generate_swaps, generate_users, skill_swap
+
+from ratings import star_rating
+
+READ_PATHS = ['/api/skills?limit=50', '/api/skills?search=python&limit=20', '/api/skills?category=Design',
+              '/api/skills?sort=rating&limit=20', '/api/swap-requests', '/api/swap-requests/counts',
+              '/api/users/search?skill=design&limit=20', '/api/admin/swaps?limit=200', '/api/admin/users?limit=200']
+
+
+def writer(number, args, rows, results):
+    """Create and change records, remembering what each write should have left behind"""
+    rng = random.Random(number)
+    client = skill_swap.app.test_client()
+    created = results['created']
+    swaps = {}
+    for i in range(args.operations):
+        choice = rng.random()
+        if choice < 0.15:
+            # Every writer tries the same contested names; exactly one may win each
+            name = f'contested{i % 50}' if rng.random() < 0.5 else f'writer{number}-{i}'
+            response = client.post('/api/auth/register', json={
+                'username': name, 'email': f'{name}@example.com', 'password': 'p',
+                'first_name': 'Stress', 'last_name': str(number), 'skills_offered': ['Python']})
+            if response.status_code == 201:
+                created['users'].append(response.get_json()['user']['id'])
+                results['registered'].append(name)
+        elif choice < 0.3:
+            response = client.post('/api/skills', json={
+                'title': f'Stress skill {number}-{i}', 'description': 'concurrent', 'category': 'Design',
+                'proficiency_level': 'Expert', 'tags': ['stress']})
+            created['skills'].append(response.get_json()['skill']['id'])
+        elif choice < 0.6 or not swaps:
+            response = client.post('/api/swap-requests', json={
+                'to_user_id': rng.randint(2, rows), 'skill_id': rng.randint(1, rows), 'message': f'{number}-{i}'})
+            swap_id = response.get_json()['request']['id']
+            created['swap_requests'].append(swap_id)
+            swaps[swap_id] = {'status': 'pending'}
+        else:
+            swap_id = rng.choice(list(swaps))
+            action = rng.choice(['accept', 'reject', 'feedback', 'delete'])
+            if action == 'delete':
+                response = client.delete(f'/api/swap-requests/{swap_id}')
+                del swaps[swap_id]
+                results['deleted'].append(swap_id)
+            elif action == 'feedback':
+                rating = rng.randint(1, 5)
+                response = client.post(f'/api/swap-requests/{swap_id}/feedback', json={'feedback': 'ok', 'rating': rating})
+                swaps[swap_id] = {'status': 'completed', 'rating': rating}
+            else:
+                response = client.post(f'/api/swap-requests/{swap_id}/{action}')
+                swaps[swap_id] = {'status': action + 'ed'}
+        if response.status_code >= 500:
+            results['failures'].append(f'{response.status_code} from writer {number}')
+    results['expected'].update(swaps)
+    results['writes'].append(args.operations)
+
+
+def reader(stop, results):
+    client = skill_swap.app.test_client()
+    rng = random.Random()
+    reads = 0
+    while not stop.is_set():
+        response = client.get(rng.choice(READ_PATHS))
+        reads += 1
+        if response.status_code != 200:
+            results['failures'].append(f'{response.status_code} from {response.request.path}')
+    results['reads'].append(reads)
+
+
+def check(results, seeded):
+    """Return a list of problems found in the final state"""
+    problems = list(results['failures'])
+    collections = {'users': skill_swap.users, 'skills': skill_swap.skills, 'swap_requests': skill_swap.swap_requests}
+    for name, ids in results['created'].items():
+        duplicates = [record_id for record_id, count in Counter(ids).items() if count > 1]
+        if duplicates:
+            problems.append(f'{name}: ids handed out twice: {duplicates[:10]}')
+        deleted = set(results['deleted']) if name == 'swap_requests' else set()
+        missing = [record_id for record_id in ids if record_id not in collections[name] and record_id not in deleted]
+        if missing:
+            problems.append(f'{name}: created records missing: {missing[:10]}')
+        expected = seeded[name] + len(ids) - len(deleted)
+        if len(collections[name]) != expected:
+            problems.append(f'{name}: {len(collections[name])} records stored, expected {expected}')
+    for swap_id, state in results['expected'].items():
+        stored = skill_swap.swap_requests.get(swap_id)
+        if stored is None or any(stored.get(field) != value for field, value in state.items()):
+            problems.append(f'swap {swap_id} is {stored and stored.copy()}, expected {state}')
+    contested = Counter(name for name in results['registered'] if name.startswith('contested'))
+    problems.extend(f'{name} registered {count} times' for name, count in contested.items() if count > 1)
+
+    # Indexes must agree with a scan of the records
+    swaps = list(skill_swap.swap_requests)
+    inbox = skill_swap.swap_inbox.counts(1)
+    for direction, field in (('outgoing', 'from_user_id'), ('incoming', 'to_user_id')):
+        scanned = Counter(swap['status'] for swap in swaps if swap[field] == 1)
+        if {status: count for status, count in inbox[direction].items() if count} != dict(scanned):
+            problems.append(f'inbox {direction} counts {inbox[direction]} != scanned {dict(scanned)}')
+    rated = Counter(swap['to_user_id'] for swap in swaps if star_rating(swap) is not None)
+    for user_id, count in rated.items():
+        if skill_swap.user_ratings.summary(user_id)['count'] != count:
+            problems.append(f'user {user_id} rating count {skill_swap.user_ratings.summary(user_id)["count"]} != {count}')
+    categories = Counter(skill['category'] for skill in skill_swap.skills)
+    if skill_swap.skill_categories.counts() != dict(categories):
+        problems.append('skill category counts disagree with the records')
+    if skill_swap.skill_activity.totals() != dict(categories):
+        problems.append('skill analytics disagree with the records')
+    if skill_swap.swap_activity.totals() != dict(Counter(swap['status'] for swap in swaps)):
+        problems.append('swap analytics disagree with the records')
+    listed = [record['id'] for record in skill_swap.swap_requests.after()]
+    if listed != sorted(swap['id'] for swap in swaps):
+        problems.append('id order disagrees with the stored swap requests')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000, help='generated rows per collection')
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--operations', type=int, default=500, help='writes per writer thread')
+    parser.add_argument('--switch-interval', type=float, default=1e-5,
+                        help='seconds between forced thread switches (smaller interleaves more)')
+    args = parser.parse_args()
+    rng = random.Random(1)
+    skill_swap.users.extend(generate_users(args.rows, rng))
+    skill_swap.skills.extend(generate_skills(args.rows, args.rows, rng))
+    skill_swap.swap_requests.extend(generate_swaps(args.rows, args.rows, args.rows, 100, rng))
+    seeded = {name: len(getattr(skill_swap, name)) for name in ('users', 'skills', 'swap_requests')}
+    sys.setswitchinterval(args.switch_interval)
+
+    results = {'created': {'users': [], 'skills': [], 'swap_requests': []}, 'deleted': [], 'registered': [],
+               'expected': {}, 'failures': [], 'writes': [], 'reads': []}
+    stop = threading.Event()
+    readers = [threading.Thread(target=reader, args=(stop, results)) for _ in range(args.readers)]
+    writers = [threading.Thread(target=writer, args=(n, args, args.rows, results)) for n in range(args.writers)]
+    started = time.perf_counter()
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    problems = check(results, seeded)
+    writes, reads = sum(results['writes']), sum(results['reads'])
+    print(json.dumps({
+        'writers': args.writers, 'readers': args.readers, 'writes': writes, 'reads': reads,
+        'writes_per_second': round(writes / elapsed),
+        'reads_per_second': round(reads / elapsed),
+        'problems': problems[:50],
+    }, indent=2))
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""Bulk NDJSON/CSV import and streaming NDJSON export"""
+import ast
+import csv
+import json
+
+from records import to_json
+from reports import CHUNK_SIZE
+
+# Records validated before each batched insert, and the errors reported back
+BATCH_SIZE = 1000
+MAX_ERRORS = 100
+
+
+class InvalidLine(str):
+    """A line that was not valid UTF-8, decoded with replacement characters"""
+
+
+def decode_lines(stream, chunk_size=64 * 1024):
+    """Lines of a binary stream as text, decoded one line at a time.
+
+    A line that is not valid UTF-8 comes out as an InvalidLine, so the
+    readers can reject just that line (or CSV row) and carry on.
+    """
+    rest = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            yield _decode(line + b'\n')
+    if rest:
+        yield _decode(rest)
+
+
+def _decode(line):
+    try:
+        return line.decode('utf-8')
+    except UnicodeDecodeError:
+        return InvalidLine(line.decode('utf-8', 'replace'))
+
+
+def read_ndjson(lines):
+    """Yield (line number, object) per non-blank line; bad lines yield a ValueError instead"""
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, InvalidLine):
+            yield number, ValueError('Invalid UTF-8')
+            continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield number, ValueError('Invalid JSON')
+            continue
+        yield number, data if isinstance(data, dict) else ValueError('Expected a JSON object')
+
+
+def number(text):
+    """Parse an int where possible, otherwise a float"""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_value(text, kind):
+    """Convert one CSV cell to the field's type"""
+    if kind is bool:
+        if text.lower() in ('true', '1', 'yes'):
+            return True
+        if text.lower() in ('false', '0', 'no'):
+            return False
+        raise ValueError(f'{text!r} is not a boolean')
+    if kind is list:
+        # JSON arrays, the Python lists written by the CSV reports, or a plain comma list
+        if text.startswith('['):
+            try:
+                return json.loads(text)
+            except ValueError:
+                return list(ast.literal_eval(text))
+        return [item.strip() for item in text.split(',') if item.strip()]
+    return kind(text)
+
+
+def read_csv(lines, types):
+    """Yield (line number, row) from CSV text with a header line, typed by `types`.
+
+    Empty cells are left out so the import applies the same defaults as the
+    JSON form; unconvertible cells and rows that are not valid UTF-8 yield a
+    ValueError for the row.
+    """
+    invalid = []
+
+    def checked(lines):
+        for line in lines:
+            if isinstance(line, InvalidLine):
+                invalid.append(line)
+            yield line
+
+    reader = csv.DictReader(checked(lines))
+    header_invalid = bool(reader.fieldnames is not None and invalid)
+    for row in reader:
+        if header_invalid or invalid:
+            invalid.clear()
+            yield reader.line_num, ValueError('Invalid UTF-8' + (' in the header line' if header_invalid else ''))
+            continue
+        data = {}
+        try:
+            for name, text in row.items():
+                if name is None or text is None or text == '':
+                    continue
+                data[name] = parse_value(text, types.get(name, str))
+        except (ValueError, SyntaxError) as e:
+            yield reader.line_num, ValueError(f'{name}: {e}')
+            continue
+        yield reader.line_num, data
+
+
+def import_records(collection, rows, build):
+    """Validate, deduplicate and insert parsed rows in batches.
+
+    `rows` yields (line number, data or ValueError) and `build` turns data
+    into a record without an id, raising ValueError or KeyError when it is
+    invalid. Records keep an explicit id if they carry one; the rest get
+    ids after the highest seen so far. Duplicate ids and unique-field values,
+    both against the collection and within the upload, are skipped; so are
+    rows that a concurrent write claims between validation and insertion.
+    Returns the imported and skipped counts and the first MAX_ERRORS problems.
+    """
+    imported = 0
+    skipped = 0
+    errors = []
+    batch = []
+    taken = {field: set() for field in collection.unique}
+    ids = set()
+    highest = 0
+    # Auto ids come from blocks reserved with next_id(), growing up to BATCH_SIZE
+    reserved = iter(())
+    block = 1
+    for number, data in rows:
+        try:
+            if isinstance(data, ValueError):
+                raise data
+            record = build(data)
+            collection.check(record)
+            record_id = data.get('id')
+            if record_id is not None:
+                if isinstance(record_id, bool) or not isinstance(record_id, int) or record_id < 1:
+                    raise ValueError('id must be a positive integer')
+                if record_id in ids or record_id in collection:
+                    raise ValueError(f'Duplicate id {record_id}')
+            for field, values in taken.items():
+                if record.get(field) in values or collection.get_by(field, record.get(field)) is not None:
+                    raise ValueError(f'Duplicate {field} {record.get(field)!r}')
+        except (ValueError, KeyError, TypeError) as e:
+            skipped += 1
+            _note_error(errors, number, e)
+            continue
+        if record_id is None:
+            record_id = next(reserved, None)
+            if record_id is None or record_id <= highest:
+                record_id = collection.next_id(block, after=highest)
+                reserved = iter(range(record_id + 1, record_id + block))
+                block = min(block * 2, BATCH_SIZE)
+        record['id'] = record_id
+        ids.add(record_id)
+        highest = max(highest, record_id)
+        for field, values in taken.items():
+            values.add(record.get(field))
+        batch.append((number, record))
+        if len(batch) == BATCH_SIZE:
+            done = _insert_batch(collection, batch, errors)
+            imported += done
+            skipped += len(batch) - done
+            batch = []
+    if batch:
+        done = _insert_batch(collection, batch, errors)
+        imported += done
+        skipped += len(batch) - done
+    return {'imported': imported, 'skipped': skipped, 'errors': errors}
+
+
+def _insert_batch(collection, batch, errors):
+    """Insert (line number, record) pairs and return how many were stored.
+
+    A batch that a concurrent write conflicts with since validation, or
+    that an index rejects, is retried row by row, and the failing rows are
+    noted in errors.
+    """
+    try:
+        return len(collection.insert_many([record for _, record in batch]))
+    except (KeyError, ValueError, TypeError):
+        # Nothing was stored; find the rows at fault one by one
+        pass
+    stored = 0
+    for number, record in batch:
+        try:
+            collection.insert(record)
+        except (KeyError, ValueError, TypeError) as e:
+            _note_error(errors, number, e)
+            continue
+        stored += 1
+    return stored
+
+
+def _note_error(errors, number, error):
+    if len(errors) < MAX_ERRORS:
+        # KeyError's str() quotes its message
+        message = error.args[0] if isinstance(error, KeyError) and error.args else error
+        errors.append({'line': number, 'error': str(message)})
+
+
+def ndjson_chunks(items):
+    """Encode objects one per line, yielding roughly CHUNK_SIZE pieces"""
+    buffer = []
+    size = 0
+    for item in items:
+        line = json.dumps(item, separators=(',', ':'), default=to_json) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,75 @@
+"""Response cache with version-based invalidation and strong ETags"""
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, g, request
+
+
+class ResponseCache(object):
+    """Bounded LRU map of cache key -> rendered response entry"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def cached(cache, *collections):
+    """Serve a GET view from cache until any of the given collections changes.
+
+    The key is the path, the query string and the collections' write
+    versions, so a write makes older entries unreachable and they age out of
+    the LRU. Responses carry a strong ETag of the body, and a matching
+    If-None-Match gets a 304 without the view running at all. The entry is
+    left in g.cache_entry so later hooks (compression) can keep derived
+    forms of the body in it.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, tuple(sorted(request.args.items(multi=True))),
+                   tuple(collection.version for collection in collections))
+            entry = cache.get(key)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                entry = {
+                    'body': body,
+                    'etag': hashlib.blake2b(body, digest_size=16).hexdigest(),
+                    'mimetype': response.mimetype,
+                    'headers': [(name, value) for name, value in response.headers.items()
+                                if name.lower().startswith('x-')],
+                }
+                cache.put(key, entry)
+            g.cache_entry = entry
+            response = Response(entry['body'], mimetype=entry['mimetype'], headers=entry['headers'])
+            response.set_etag(entry['etag'])
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
@@ -0,0 +1,99 @@
+"""Content-negotiated response compression: gzip, and brotli when it is installed"""
+import zlib
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Bodies below this many bytes gain too little to be worth compressing
+MIN_SIZE = 1024
+COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain', 'text/html')
+
+
+class Compressor(object):
+    """Compresses response bodies in the encoding the client prefers.
+
+    Installed as an after_request hook. Buffered responses of a compressible
+    type and at least min_size bytes are compressed; streamed responses
+    (reports, events), files and bodies that already carry a
+    Content-Encoding are left alone, though streamed downloads can use
+    stream(). A response served from the response cache keeps each
+    compressed variant in its cache entry, next to the ETag, so an unchanged
+    body is compressed once per encoding. Compressed responses get a weak
+    ETag, which still matches If-None-Match. `level` is the gzip level
+    (1-9, 0 turns compression off) and `brotli_quality` the brotli one (0-11).
+    """
+
+    def __init__(self, level=6, brotli_quality=4, min_size=MIN_SIZE):
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.min_size = min_size
+
+    def init_app(self, app):
+        if self.level:
+            app.after_request(self._compress)
+
+    def negotiate(self):
+        """The best encoding the client accepts, or None"""
+        if not self.level:
+            return None
+        offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return request.accept_encodings.best_match(offered)
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+
+    def stream(self, chunks, encoding):
+        """Compress a stream of text chunks incrementally"""
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            process, finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            process, finish = compressor.compress, compressor.flush
+        for chunk in chunks:
+            data = process(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield finish()
+
+    def _compress(self, response):
+        if response.status_code == 304:
+            # Same validators as the compressed 200 this stands in for
+            entry = g.get('cache_entry')
+            if entry is not None and self.negotiate() in entry.get('encoded', {}):
+                response.vary.add('Accept-Encoding')
+                self._weaken_etag(response)
+            return response
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+        entry = g.get('cache_entry')
+        variants = entry.setdefault('encoded', {}) if entry is not None else {}
+        body = variants.get(encoding)
+        if body is None:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            body = variants[encoding] = self.compress(data, encoding)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        self._weaken_etag(response)
+        return response
+
+    @staticmethod
+    def _weaken_etag(response):
+        # The ETag is of the uncompressed body, so it only identifies the content weakly
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
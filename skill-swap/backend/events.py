@@ -0,0 +1,87 @@
+"""In-process publish/subscribe bus behind the server-sent event stream"""
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+from records import to_json
+
+
+class Subscription(object):
+    """One client's queue of pending events"""
+
+    def __init__(self, user_id, max_pending):
+        self.user_id = user_id
+        self.queue = queue.Queue(max_pending)
+        self.overflowed = False
+
+
+class EventBus(object):
+    """Fans published events out to the subscribers they are addressed to.
+
+    Events go to a set of user ids, or to everyone when user_ids is None.
+    The last `backlog` events are kept so a reconnecting client can resume
+    from its Last-Event-ID. Waiting uses queue.Queue, which gevent's monkey
+    patching makes cooperative, so idle streams cost a greenlet rather than
+    a worker thread when served with a gevent worker.
+    """
+
+    def __init__(self, backlog=1000, max_pending=1000):
+        self.max_pending = max_pending
+        self._subscribers = set()
+        self._backlog = deque(maxlen=backlog)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, user_id, last_event_id=None):
+        """Register a subscriber, queueing any backlog events it missed"""
+        subscription = Subscription(user_id, self.max_pending)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._backlog:
+                    if event[0] > last_event_id and self._visible(event, user_id):
+                        self._offer(subscription, event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, name, data, user_ids=None):
+        with self._lock:
+            event = (next(self._ids), name, json.dumps(data, default=to_json), frozenset(user_ids) if user_ids is not None else None)
+            self._backlog.append(event)
+            for subscription in list(self._subscribers):
+                if self._visible(event, subscription.user_id):
+                    self._offer(subscription, event)
+
+    @staticmethod
+    def _visible(event, user_id):
+        return event[3] is None or user_id in event[3]
+
+    def _offer(self, subscription, event):
+        try:
+            subscription.queue.put_nowait(event)
+        except queue.Full:
+            # A stalled client is cut off; it resumes from the backlog when it reconnects
+            subscription.overflowed = True
+            self._subscribers.discard(subscription)
+
+    def stream(self, subscription, heartbeat=15):
+        """Yield the subscription's events in text/event-stream format until the client goes away"""
+        try:
+            yield 'retry: 3000\n\n'
+            while not subscription.overflowed:
+                try:
+                    event_id, name, data, _ = subscription.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'id: {event_id}\nevent: {name}\ndata: {data}\n\n'
+        finally:
+            self.unsubscribe(subscription)
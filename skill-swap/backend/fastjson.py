@@ -0,0 +1,83 @@
+"""JSON provider backed by orjson when installed, plus helpers for pre-encoded fragments"""
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+from records import Record
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder produces the same compact output, only slower
+    orjson = None
+
+
+def default(value):
+    """Serialize stored records like dicts; anything else as Flask's provider would"""
+    if isinstance(value, Record):
+        return value.copy()
+    return DefaultJSONProvider.default(value)
+
+
+def _stdlib_dumps(value):
+    """Compact, key-sorted JSON bytes from the stdlib encoder"""
+    return json.dumps(value, default=default, sort_keys=True, separators=(',', ':')).encode()
+
+
+if orjson is not None:
+    OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value):
+        """Compact, key-sorted JSON bytes"""
+        try:
+            return orjson.dumps(value, default=default, option=OPTIONS)
+        except TypeError:
+            # orjson.JSONEncodeError: integers over 64 bits or nesting deeper
+            # than 254 levels, both of which the stdlib encoder accepts
+            return _stdlib_dumps(value)
+else:
+    dumps = _stdlib_dumps
+
+
+def extend_object(encoded, fields):
+    """Add already-encoded fields to an encoded, non-empty JSON object"""
+    if not fields:
+        return encoded
+    parts = [encoded[:-1]]
+    for name, value in fields.items():
+        parts.append(b',' + dumps(name) + b':' + value)
+    parts.append(b'}')
+    return b''.join(parts)
+
+
+def array(fragments):
+    """An encoded JSON array of already-encoded items"""
+    return b'[' + b','.join(fragments) + b']\n'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson (stdlib json without it).
+
+    Stored records serialize like dicts. Output matches the default
+    provider's compact, key-sorted form, except that non-ASCII characters
+    are sent as UTF-8 instead of \\u escapes.
+    """
+
+    default = staticmethod(default)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            body = self.dumps(obj, indent=2) + '\n'
+        else:
+            body = dumps(obj) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
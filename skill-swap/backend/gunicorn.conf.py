@@ -0,0 +1,19 @@
+"""Gunicorn settings for serving the API, including the long-lived /api/events streams.
+
+Workers are gevent ones, so each open event stream waits in a greenlet
+instead of holding a thread. gevent monkey-patches the whole app: store
+locks are then held per greenlet, while photo processing, the profiler's
+sampler and the write-ahead log's fsyncs run on native threads (native.py)
+so they never stall the hub. SQLite queries still run on the hub. See the
+README for details. Run from the backend directory:
+    gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('SKILL_SWAP_BIND', '0.0.0.0:5000')
+worker_class = 'gevent'
+# Concurrent connections (open event streams included) per worker
+worker_connections = int(os.environ.get('SKILL_SWAP_CONNECTIONS', 1000))
+# Without SKILL_SWAP_DB the store lives in one process's memory, so only one worker can serve it
+workers = int(os.environ.get('SKILL_SWAP_WORKERS', multiprocessing.cpu_count() if os.environ.get('SKILL_SWAP_DB') else 1))
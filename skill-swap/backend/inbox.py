@@ -0,0 +1,48 @@
+"""Per-user swap request index split by direction and status"""
+
+STATUSES = ('pending', 'accepted', 'rejected', 'completed')
+
+
+class SwapInbox(object):
+    """user id -> {status -> swap ids} for incoming and outgoing requests.
+
+    Attached to the swap_requests collection, so creation, status changes
+    (an update is a remove followed by an add) and deletes keep it current.
+    """
+
+    def __init__(self):
+        self._incoming = {}
+        self._outgoing = {}
+
+    def add(self, swap):
+        for side, user_id in ((self._incoming, swap['to_user_id']), (self._outgoing, swap['from_user_id'])):
+            side.setdefault(user_id, {}).setdefault(swap['status'], set()).add(swap['id'])
+
+    def remove(self, swap):
+        for side, user_id in ((self._incoming, swap['to_user_id']), (self._outgoing, swap['from_user_id'])):
+            partitions = side.get(user_id, {})
+            ids = partitions.get(swap['status'])
+            if ids is None:
+                continue
+            ids.discard(swap['id'])
+            if not ids:
+                del partitions[swap['status']]
+                if not partitions:
+                    del side[user_id]
+
+    def ids(self, user_id, direction=None, status=None):
+        """Ids of the user's requests, in id order, optionally narrowed by direction and status"""
+        sides = {'incoming': (self._incoming,), 'outgoing': (self._outgoing,)}.get(direction, (self._incoming, self._outgoing))
+        found = set()
+        for side in sides:
+            partitions = side.get(user_id, {})
+            for ids in (partitions.values() if status is None else [partitions.get(status, ())]):
+                found.update(ids)
+        return sorted(found)
+
+    def counts(self, user_id):
+        """Request counts per status for each direction"""
+        return {
+            direction: {status: len(side.get(user_id, {}).get(status, ())) for status in STATUSES}
+            for direction, side in (('incoming', self._incoming), ('outgoing', self._outgoing))
+        }
@@ -0,0 +1,303 @@
+"""Write-ahead log and snapshot storage backend for a single-process store"""
+import atexit
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+import native
+from records import to_json
+from store import paused_gc
+
+try:
+    import fcntl
+except ImportError:  # Windows: the data directory is not locked against a second process
+    fcntl = None
+
+# Every log entry is framed as payload length + CRC32 so a torn tail is detected on replay
+HEADER = struct.Struct('<II')
+SNAPSHOT_MAGIC = b'SKILLSWAP-SNAPSHOT-1\n'
+
+
+class LogBackend(object):
+    """Keeps collections in memory and makes every write durable in an append-only log.
+
+    Writes are framed JSON entries appended by one flusher thread. Writers
+    that arrive while an fsync is in progress are written and fsynced
+    together on the next round (group commit), so many writes share one
+    fsync. A write only queues its entry; with durable=True, flush()
+    returns once the calling thread's entries are on disk. Collections
+    call it after releasing their write lock, so writers to the same
+    collection still share fsyncs. Once snapshot_every entries have been logged, snapshot_due()
+    turns true and the repository hands over its collections. Their
+    records are read in chunks and pickled to a snapshot in the
+    background, and the log segments the snapshot covers are removed. Startup memory-maps the newest snapshot
+    and replays the log written after it.
+
+    The directory belongs to one process; use SQLiteBackend to share a
+    store between workers.
+    """
+
+    def __init__(self, directory, snapshot_every=100000, durable=True):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.durable = durable
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, 'LOCK'), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise RuntimeError(f'{directory} is already in use by another process')
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._pending = []
+        self._error = None
+        self._closed = False
+        self._snapshotting = False
+        with paused_gc():
+            self._recovered, self._seq, segment = self._recover()
+        self._written = self._seq
+        self._since_snapshot = 0
+        self._log = open(segment, 'ab')
+        self._flusher = threading.Thread(target=self._flush_loop, name='wal-flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # Recovery
+
+    def _files(self, prefix):
+        """(seq, path) of the snapshot or log files in the directory, oldest first"""
+        found = []
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name.endswith('.bin'):
+                seq = name[len(prefix):-len('.bin')]
+                if seq.isdigit():
+                    found.append((int(seq), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def _recover(self):
+        """Load the newest snapshot and replay the log after it.
+
+        Returns ({name: {id: record}}, last applied entry, log segment to append to).
+        """
+        state = {}
+        seq = 0
+        snapshots = self._files('snapshot-')
+        if snapshots:
+            seq, path = snapshots[-1]
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if mapped.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    raise ValueError(f'{path} is not a snapshot')
+                for name, records in pickle.load(mapped).items():
+                    state[name] = {record['id']: record for record in records}
+        segments = [(start, path) for start, path in self._files('wal-') if start >= seq]
+        for start, path in segments:
+            for entry in self._read_segment(path):
+                self._apply(state, entry)
+                seq += 1
+        segment = segments[-1][1] if segments else os.path.join(self.directory, f'wal-{seq:020d}.bin')
+        return state, seq, segment
+
+    def _read_segment(self, path):
+        """Yield the entries of one log segment, cutting off a torn or corrupt tail"""
+        with open(path, 'rb+') as f:
+            data = f.read()
+            offset = 0
+            while offset + HEADER.size <= len(data):
+                length, checksum = HEADER.unpack_from(data, offset)
+                payload = data[offset + HEADER.size:offset + HEADER.size + length]
+                if len(payload) < length or zlib.crc32(payload) != checksum:
+                    break
+                yield json.loads(payload)
+                offset += HEADER.size + length
+            if offset < len(data):
+                f.truncate(offset)
+
+    @staticmethod
+    def _apply(state, entry):
+        op, name, value = entry
+        records = state.setdefault(name, {})
+        if op == 'delete':
+            records.pop(value, None)
+        elif op == 'insert_many':
+            for record in value:
+                records[record['id']] = record
+        else:
+            records[value['id']] = value
+
+    # Backend interface
+
+    def register(self, name, columns, unique):
+        pass
+
+    def load(self, name):
+        """Records recovered at startup; the log keeps no copy once they are handed over"""
+        records = self._recovered.pop(name, {})
+        return sorted(records.values(), key=lambda record: record['id'])
+
+    def insert(self, name, record):
+        self._append('insert', name, record)
+
+    def insert_many(self, name, records):
+        self._append('insert_many', name, records)
+
+    def update(self, name, record):
+        self._append('update', name, record)
+
+    def delete(self, name, record_id):
+        self._append('delete', name, record_id)
+
+    def flush(self):
+        """Wait until this thread's logged writes are on disk (with durable=True)"""
+        seq = getattr(self._local, 'seq', 0)
+        if not self.durable or not seq:
+            return
+        with self._cond:
+            while self._written < seq and self._error is None:
+                self._cond.wait()
+            if self._error is not None:
+                raise self._error
+
+    def allocate_ids(self, name, count, floor):
+        return None
+
+    def changes(self):
+        return []
+
+    def fetch(self, name, record_id):
+        return None
+
+    # Group commit
+
+    def _append(self, op, name, value):
+        payload = json.dumps([op, name, value], separators=(',', ':'), default=to_json).encode()
+        entry = HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise RuntimeError('The write-ahead log is closed')
+            self._seq += 1
+            seq = self._seq
+            self._since_snapshot += 1
+            self._pending.append(entry)
+            self._cond.notify_all()
+        self._local.seq = seq
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                batch = self._pending
+                self._pending = []
+                seq = self._seq
+            try:
+                # Under gevent the writes and fsync run on a native thread, so they never stall the hub
+                native.call(self._write_batch, batch)
+            except OSError as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._written = seq
+                self._cond.notify_all()
+
+    def _write_batch(self, batch):
+        for item in batch:
+            if isinstance(item, bytes):
+                self._log.write(item)
+            else:
+                # A snapshot started here: later entries go to a new segment
+                self._log = self._rotate(self._log, item)
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def _rotate(self, log, start):
+        log.flush()
+        os.fsync(log.fileno())
+        log.close()
+        log = open(os.path.join(self.directory, f'wal-{start:020d}.bin'), 'ab')
+        self._sync_directory()
+        return log
+
+    def close(self):
+        """Flush pending entries, stop the flusher and release the directory"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self._log.close()
+        self._lock_file.close()
+
+    # Snapshots
+
+    def snapshot_due(self):
+        return self._since_snapshot >= self.snapshot_every and not self._snapshotting
+
+    def snapshot(self, collections):
+        """Snapshot {name: chunks of records} in the background.
+
+        Only the marker is logged here; the chunks are read on the snapshot
+        thread, so this is a fuzzy checkpoint. Records may already include
+        writes logged after the marker. That is safe because every entry
+        replayed from the marker on is a whole-record write or a delete,
+        which lands on the same final state whatever the snapshot held.
+        """
+        with self._cond:
+            if self._snapshotting:
+                return
+            self._snapshotting = True
+            seq = self._seq
+            self._since_snapshot = 0
+            self._pending.append(seq)
+            self._cond.notify_all()
+        threading.Thread(target=self._write_snapshot, args=(seq, collections), name='wal-snapshot', daemon=True).start()
+
+    def _write_snapshot(self, seq, collections):
+        try:
+            copies = {}
+            for name, chunks in collections.items():
+                records = copies[name] = []
+                for chunk in chunks:
+                    records.extend(chunk)
+                    # Let waiting writers (and, under gevent, other greenlets) in between chunks
+                    time.sleep(0)
+            native.call(self._save_snapshot, seq, copies)
+            with self._cond:
+                while self._written < seq and self._error is None:
+                    self._cond.wait()
+            # Everything up to seq is in the snapshot now
+            for start, old in self._files('snapshot-') + self._files('wal-'):
+                if start < seq:
+                    os.remove(old)
+        finally:
+            with self._cond:
+                self._snapshotting = False
+
+    def _save_snapshot(self, seq, collections):
+        path = os.path.join(self.directory, f'snapshot-{seq:020d}.bin')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            pickle.dump(collections, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        self._sync_directory()
+
+    def _sync_directory(self):
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,64 @@
+"""Reciprocal skill matching between users"""
+import heapq
+
+from store import normalize
+
+
+class SkillMatchIndex(object):
+    """Offered-skill -> user ids and wanted-skill -> user ids, kept in sync with the users collection"""
+
+    def __init__(self):
+        self._offered = {}
+        self._wanted = {}
+        self._users = {}
+
+    @staticmethod
+    def _skills(values):
+        # A single value (such as a bare string) counts as one skill, as in SubstringIndex
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        return {normalize(value) for value in values if normalize(value)}
+
+    def add(self, user):
+        offered = self._skills(user.get('skills_offered'))
+        wanted = self._skills(user.get('skills_wanted'))
+        self._users[user['id']] = (offered, wanted)
+        for skill in offered:
+            self._offered.setdefault(skill, set()).add(user['id'])
+        for skill in wanted:
+            self._wanted.setdefault(skill, set()).add(user['id'])
+
+    def remove(self, user):
+        offered, wanted = self._users.pop(user['id'], ((), ()))
+        for postings, skills in ((self._offered, offered), (self._wanted, wanted)):
+            for skill in skills:
+                ids = postings[skill]
+                ids.discard(user['id'])
+                if not ids:
+                    del postings[skill]
+
+    def matches(self, user_id, limit=10, eligible=None):
+        """Return the top (user id, score, they_offer, they_want) reciprocal matches.
+
+        A candidate must offer at least one skill this user wants and want at
+        least one skill this user offers; the score is the number of skills
+        exchanged in both directions. Only the posting lists of this user's own
+        skills are touched, so the cost does not grow with the user count.
+        """
+        offered, wanted = self._users.get(user_id, ((), ()))
+        they_offer = {}
+        for skill in wanted:
+            for other in self._offered.get(skill, ()):
+                they_offer.setdefault(other, []).append(skill)
+        they_want = {}
+        for skill in offered:
+            for other in self._wanted.get(skill, ()):
+                if other in they_offer:
+                    they_want.setdefault(other, []).append(skill)
+        candidates = (
+            (len(they_offer[other]) + len(skills), other)
+            for other, skills in they_want.items()
+            if other != user_id and (eligible is None or eligible(other))
+        )
+        best = heapq.nsmallest(limit, candidates, key=lambda item: (-item[0], item[1]))
+        return [(other, score, sorted(they_offer[other]), sorted(they_want[other])) for score, other in best]
@@ -0,0 +1,188 @@
+"""Opt-in request metrics in Prometheus text format, plus a per-request sampling profiler"""
+import bisect
+import hmac
+import itertools
+import sys
+import threading
+import time
+from collections import deque
+
+from flask import g, request
+
+import native
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Metrics(object):
+    """Per-route latency histograms, response sizes and record counts.
+
+    Hooks are only registered when enabled, so a disabled instance costs
+    nothing. Each request does a few dict updates under one lock, which is
+    cheap enough to leave on under load. Profiling is off unless a
+    profile_token is configured, and then only requests whose X-Profile
+    header carries that token are sampled.
+    """
+
+    def __init__(self, enabled=False, profile_interval=0.001, keep_profiles=20, profile_token=None):
+        self.enabled = enabled
+        self.profile_interval = profile_interval
+        self.profile_token = profile_token
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._requests = {}
+        self._sizes = {}
+        self._records = {}
+        self._profile_ids = itertools.count(1)
+        self.profiles = deque(maxlen=keep_profiles)
+
+    def init_app(self, app):
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    @staticmethod
+    def _route():
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        if self._may_profile(request.headers.get('X-Profile')):
+            g.metrics_sampler = Sampler(native.get_ident(), self.profile_interval, native.current_greenlet())
+            g.metrics_sampler.start()
+
+    def _may_profile(self, token):
+        if not self.profile_token or not token:
+            return False
+        return hmac.compare_digest(token.encode(), self.profile_token.encode())
+
+    def _finish(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        key = (self._route(), request.method)
+        size = response.calculate_content_length() if not response.is_streamed else None
+        with self._lock:
+            buckets = self._latency.get(key)
+            if buckets is None:
+                buckets = self._latency[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            buckets[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            buckets[-1] += elapsed
+            status_key = key + (response.status_code,)
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            if size is not None:
+                total = self._sizes.setdefault(key, [0, 0])
+                total[0] += size
+                total[1] += 1
+        sampler = g.pop('metrics_sampler', None)
+        if sampler is not None:
+            profile_id = next(self._profile_ids)
+            self.profiles.append({'id': profile_id, 'route': key[0], 'seconds': elapsed, 'folded': sampler.stop()})
+            response.headers['X-Profile-Id'] = str(profile_id)
+        return response
+
+    def count_rows(self, rows, kind='scanned'):
+        """Wrap an iterable so the records it yields are counted against the current route"""
+        if not self.enabled:
+            return rows
+        return self._counting(rows, (self._route(), kind))
+
+    def _counting(self, rows, key):
+        # Counted locally and added once, after the consumer is done (even for streamed responses)
+        count = 0
+        try:
+            for row in rows:
+                count += 1
+                yield row
+        finally:
+            self.add_records(key, count)
+
+    def note_rows(self, count, kind='joined'):
+        if self.enabled:
+            self.add_records((self._route(), kind), count)
+
+    def add_records(self, key, count):
+        with self._lock:
+            self._records[key] = self._records.get(key, 0) + count
+
+    def profile(self, profile_id):
+        return next((p for p in self.profiles if p['id'] == profile_id), None)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            latency = {key: list(values) for key, values in self._latency.items()}
+            requests = dict(self._requests)
+            sizes = {key: list(values) for key, values in self._sizes.items()}
+            records = dict(self._records)
+        lines = ['# HELP skillswap_request_duration_seconds Request latency by route.',
+                 '# TYPE skillswap_request_duration_seconds histogram']
+        for (route, method), values in sorted(latency.items()):
+            labels = f'route="{route}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'skillswap_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'skillswap_request_duration_seconds_sum{{{labels}}} {values[-1]:.6f}')
+            lines.append(f'skillswap_request_duration_seconds_count{{{labels}}} {cumulative}')
+        lines += ['# HELP skillswap_requests_total Requests by route and status.',
+                  '# TYPE skillswap_requests_total counter']
+        for (route, method, status), count in sorted(requests.items()):
+            lines.append(f'skillswap_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}')
+        lines += ['# HELP skillswap_response_size_bytes Size of non-streamed response bodies.',
+                  '# TYPE skillswap_response_size_bytes summary']
+        for (route, method), (total, count) in sorted(sizes.items()):
+            labels = f'route="{route}",method="{method}"'
+            lines.append(f'skillswap_response_size_bytes_sum{{{labels}}} {total}')
+            lines.append(f'skillswap_response_size_bytes_count{{{labels}}} {count}')
+        lines += ['# HELP skillswap_records_total Records scanned or joined by listing handlers.',
+                  '# TYPE skillswap_records_total counter']
+        for (route, kind), count in sorted(records.items()):
+            lines.append(f'skillswap_records_total{{route="{route}",kind="{kind}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+class Sampler(object):
+    """Samples one thread's stack at a fixed interval into folded (flame graph) format.
+
+    The sampler runs on an OS thread and reads the stack by OS thread id, so
+    it works under gevent too. There it follows the request's greenlet: its
+    frame is read from the OS thread while it runs, and from the greenlet
+    while it is switched out.
+    """
+
+    def __init__(self, thread_id, interval, greenlet=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.greenlet = greenlet
+        self._stacks = {}
+        self._running = False
+        self._done = None
+
+    def start(self):
+        self._running = True
+        self._done = native.start_thread(self._run)
+
+    def _run(self):
+        while self._running:
+            native.sleep(self.interval)
+            frame = self.greenlet.gr_frame if self.greenlet is not None else None
+            if frame is None:
+                frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f'{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                folded = ';'.join(reversed(stack))
+                self._stacks[folded] = self._stacks.get(folded, 0) + 1
+
+    def stop(self):
+        self._running = False
+        # Blocks this OS thread for at most one interval, even under gevent
+        self._done.acquire()
+        return '\n'.join(f'{stack} {count}' for stack, count in
+                         sorted(self._stacks.items(), key=lambda item: -item[1]))
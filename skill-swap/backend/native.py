@@ -0,0 +1,68 @@
+"""OS threads and thread ids that stay native under gevent monkey-patching.
+
+gunicorn.conf.py runs gevent workers, which patch threading so that new
+threads are greenlets on the hub's OS thread and get_ident() returns a
+greenlet id. Work that has to run beside the hub (stack sampling, blocking
+CPU or disk work) goes through these helpers instead.
+"""
+try:
+    from gevent import monkey
+except ImportError:  # no gevent, so nothing is ever patched
+    monkey = None
+
+
+def patched():
+    """True when threading has been monkey-patched by gevent"""
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+def original(module, name):
+    """The unpatched attribute of a stdlib module"""
+    if patched():
+        return monkey.get_original(module, name)
+    return getattr(__import__(module), name)
+
+
+def get_ident():
+    """Id of the calling OS thread, as used by sys._current_frames()"""
+    return original('_thread', 'get_ident')()
+
+
+def current_greenlet():
+    """The calling greenlet under gevent, else None"""
+    if not patched():
+        return None
+    import greenlet
+    return greenlet.getcurrent()
+
+
+def allocate_lock():
+    """A lock that blocks the OS thread rather than switching greenlets"""
+    return original('_thread', 'allocate_lock')()
+
+
+def sleep(seconds):
+    original('time', 'sleep')(seconds)
+
+
+def start_thread(target, *args):
+    """Run target(*args) on a new daemon OS thread; returns a lock released when it ends"""
+    done = allocate_lock()
+    done.acquire()
+
+    def run():
+        try:
+            target(*args)
+        finally:
+            done.release()
+
+    original('_thread', 'start_new_thread')(run, ())
+    return done
+
+
+def call(func, *args):
+    """func(*args), run on gevent's native thread pool when patched so only the calling greenlet waits"""
+    if not patched():
+        return func(*args)
+    import gevent
+    return gevent.get_hub().threadpool.apply(func, args)
@@ -0,0 +1,69 @@
+"""Keyset pagination and field projection for the listing endpoints"""
+import base64
+import json
+
+MAX_LIMIT = 500
+
+
+def encode_cursor(key):
+    """Turn a sort key (a list of numbers) into an opaque URL-safe token"""
+    raw = json.dumps(key, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(key, list) or not key or not all(
+            isinstance(part, (int, float)) and not isinstance(part, bool) for part in key):
+        raise ValueError('Invalid cursor')
+    return key
+
+
+def parse_args(args):
+    """Read limit, cursor and fields from the query string.
+
+    Returns (limit, after, fields); limit and after are None when absent and
+    fields is None when every field should be returned.
+    """
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        limit = min(limit, MAX_LIMIT)
+    cursor = args.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+    fields = args.get('fields')
+    fields = {f.strip() for f in fields.split(',') if f.strip()} if fields else None
+    return limit, after, fields
+
+
+def paginate(rows, key, limit=None, after=None):
+    """Take up to limit rows whose key sorts after `after` from rows ordered by key.
+
+    Stops consuming rows as soon as the page is known to be full, so lazy
+    iterables only pay for one page. Returns (page, next_cursor or None).
+    """
+    page = []
+    for row in rows:
+        if after is not None and key(row) <= after:
+            continue
+        if limit is not None and len(page) == limit:
+            return page, encode_cursor(key(page[-1]))
+        page.append(row)
+    return page, None
+
+
+def project(item, fields):
+    """Keep only the requested fields of a response item"""
+    if fields is None:
+        return item
+    return {name: value for name, value in item.items() if name in fields}
@@ -0,0 +1,129 @@
+"""Background profile-photo processing into content-addressed avatar files"""
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import native
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it uploads are stored as-is
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZES = (64, 256)
+PASSTHROUGH_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+class PhotoProcessor(object):
+    """Turns uploads into fixed-size avatars on a small worker pool.
+
+    Files are named after the SHA-256 of the upload, so the same image
+    uploaded twice is processed and stored once, and a name never changes
+    content (which is what makes them safe to cache as immutable).
+
+    The workers are OS threads even under gevent, where a patched pool would
+    run them as greenlets and decode images on the hub's thread. on_done
+    callbacks then run in a new greenlet, since they write to the store.
+    """
+
+    def __init__(self, folder, workers=2):
+        self.folder = folder
+        if native.patched():
+            from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+            self._pool = NativeThreadPoolExecutor(max_workers=workers)
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='photos')
+        self._pending = {}
+        # Also taken by the workers, so it must not be a greenlet lock
+        self._lock = native.allocate_lock()
+
+    def filenames(self, digest, original_name):
+        """Avatar file names for an upload, keyed by size"""
+        if Image is None:
+            ext = os.path.splitext(original_name)[1].lower()
+            name = f'avatar_{digest}{ext if ext in PASSTHROUGH_EXTENSIONS else ""}'
+            return {size: name for size in AVATAR_SIZES}
+        return {size: f'avatar_{digest}_{size}.jpg' for size in AVATAR_SIZES}
+
+    def submit(self, data, original_name, on_done=None):
+        """Queue an upload for processing and return its avatar file names by size.
+
+        on_done(names) is called once every avatar has been written (right
+        away if they already exist); it is not called if processing fails.
+        Raises ValueError when Pillow is available and cannot identify the image.
+        """
+        if Image is not None:
+            try:
+                # Only reads the header; the full decode happens on the pool
+                Image.open(BytesIO(data))
+            except Exception:
+                raise ValueError('Unsupported image')
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        names = self.filenames(digest, original_name)
+        with self._lock:
+            future = self._pending.get(digest)
+            if future is None and not all(
+                    os.path.exists(os.path.join(self.folder, name)) for name in names.values()):
+                future = self._pending[digest] = self._pool.submit(self._process, digest, data, names)
+        if on_done is not None:
+            if future is None:
+                on_done(names)
+            else:
+                future.add_done_callback(lambda f: f.exception() is None and self._notify(on_done, names))
+        return names
+
+    @staticmethod
+    def _notify(on_done, names):
+        if native.patched():
+            # Done callbacks run in gevent's hub, which must not block on store locks
+            import gevent
+            gevent.spawn(on_done, names)
+        else:
+            on_done(names)
+
+    def wait(self, filename, timeout=10):
+        """Block until a still-processing avatar has been written, failed or timed out"""
+        with self._lock:
+            future = next((f for digest, f in self._pending.items() if digest in filename), None)
+        if future is not None:
+            try:
+                future.result(timeout)
+            except Exception:
+                # Already logged by the worker, or still running; either way the file is not there yet
+                pass
+
+    def _process(self, digest, data, names):
+        try:
+            if Image is None:
+                self._write(names[AVATAR_SIZES[0]], data)
+                return
+            image = ImageOps.exif_transpose(Image.open(BytesIO(data))).convert('RGB')
+            for size, name in names.items():
+                avatar = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                out = BytesIO()
+                avatar.save(out, 'JPEG', quality=85, optimize=True)
+                self._write(name, out.getvalue())
+        except Exception:
+            logger.exception('Could not process uploaded photo %s', digest)
+            # Leave no set of avatars half written
+            for name in set(names.values()):
+                try:
+                    os.remove(os.path.join(self.folder, name))
+                except OSError:
+                    pass
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(digest, None)
+
+    def _write(self, name, data):
+        # Write to a temporary file and rename so readers never see a partial avatar
+        fd, tmp = tempfile.mkstemp(dir=self.folder, prefix='.tmp_')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, os.path.join(self.folder, name))
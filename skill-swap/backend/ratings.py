@@ -0,0 +1,127 @@
+"""Rating aggregates maintained from swap request feedback"""
+import bisect
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def star_rating(swap):
+    """The swap's rating as an int star level, or None if it has no valid rating"""
+    rating = swap.get('rating')
+    if isinstance(rating, bool) or not isinstance(rating, (int, float)) or rating != int(rating):
+        return None
+    return int(rating) if int(rating) in STARS else None
+
+
+def parse_rating(value):
+    """A submitted rating as an int star level, or None when none was given.
+
+    Accepts ints, whole floats and integer strings (form inputs send text);
+    0, '' and None mean "no rating". Raises ValueError for anything else.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return None
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError('rating must be a whole number from 1 to 5')
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ValueError('rating must be a whole number from 1 to 5')
+    if value == 0:
+        return None
+    if int(value) not in STARS:
+        raise ValueError('rating must be a whole number from 1 to 5')
+    return int(value)
+
+
+class RatingIndex(object):
+    """field value (a user or skill id) -> rating count, sum and star histogram.
+
+    Attached to the swap_requests collection: leaving feedback is an update
+    (remove the old swap, add the new one) and deleting a swap removes its
+    rating, so the aggregates never need a scan. Rated keys are also kept in
+    rating order for listings sorted by rating.
+    """
+
+    def __init__(self, field):
+        self.field = field
+        self._totals = {}
+        self._order = []
+        # Bumped whenever an aggregate changes; response caches key on it
+        self.version = 0
+
+    def add(self, swap):
+        self._apply(swap, 1)
+
+    def remove(self, swap):
+        self._apply(swap, -1)
+
+    def _apply(self, swap, sign):
+        rating = star_rating(swap)
+        key = swap.get(self.field)
+        if rating is None or key is None:
+            return
+        totals = self._totals.get(key)
+        if totals is None:
+            if sign < 0:
+                return
+            totals = self._totals[key] = [0, 0, [0] * len(STARS)]
+        else:
+            del self._order[bisect.bisect_left(self._order, self.sort_key(key))]
+        totals[0] += sign
+        totals[1] += sign * rating
+        totals[2][rating - 1] += sign
+        if totals[0]:
+            bisect.insort(self._order, self.sort_key(key))
+        else:
+            del self._totals[key]
+        self.version += 1
+
+    def sort_key(self, key):
+        """Keyset sort key: best mean first, then most ratings; unrated keys sort last"""
+        totals = self._totals.get(key)
+        if totals is None:
+            return [0, 0, key]
+        return [-totals[1] / totals[0], -totals[0], key]
+
+    def summary(self, key):
+        """count, sum, mean and per-star histogram for one key"""
+        count, total, histogram = self._totals.get(key) or (0, 0, [0] * len(STARS))
+        return {
+            'count': count,
+            'sum': total,
+            'mean': round(total / count, 2) if count else None,
+            'histogram': {str(star): n for star, n in zip(STARS, histogram)}
+        }
+
+    def ranked(self, after=None):
+        """Rated keys from best to worst, starting after a sort key"""
+        i = bisect.bisect_right(self._order, after) if after else 0
+        for sort_key in self._order[i:]:
+            yield sort_key[-1]
+
+    def __contains__(self, key):
+        return key in self._totals
+
+
+class FeedbackIndex(object):
+    """Ids of swap requests that carry written feedback, in id order"""
+
+    def __init__(self):
+        self._ids = []
+
+    def add(self, swap):
+        if swap.get('feedback'):
+            bisect.insort(self._ids, swap['id'])
+
+    def remove(self, swap):
+        if swap.get('feedback'):
+            i = bisect.bisect_left(self._ids, swap['id'])
+            if i < len(self._ids) and self._ids[i] == swap['id']:
+                del self._ids[i]
+
+    def ids(self):
+        return list(self._ids)
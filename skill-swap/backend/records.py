@@ -0,0 +1,152 @@
+"""Compact record types: slotted mappings with interned values and integer timestamps"""
+import sys
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from operator import attrgetter
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Slot value of a field the record does not have
+MISSING = type('Missing', (), {'__repr__': lambda self: 'MISSING'})()
+
+
+def encode_time(value):
+    """ISO timestamp -> microseconds since the epoch, or the string itself if that would not round-trip"""
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return value
+    if moment.tzinfo is not None:
+        return value
+    micros = (moment - EPOCH) // MICROSECOND
+    return micros if decode_time(micros) == value else value
+
+
+def decode_time(micros):
+    return (EPOCH + micros * MICROSECOND).isoformat()
+
+
+class Record(MutableMapping):
+    """A dict-compatible record whose known fields live in slots.
+
+    A plain dict carries a hash table per record. A subclass made by
+    record_type() stores its fields in fixed slots instead (MISSING marks an
+    absent key), and fields it does not know go to a small overflow dict.
+    Values of `interned` fields (statuses, categories, levels) share one
+    string object per distinct value. Timestamp fields are held as integer
+    microseconds and turned back into the same ISO string when read, so
+    handlers, indexes and JSON output see exactly what a dict would give.
+    copy() returns that plain dict.
+    """
+
+    __slots__ = ('_extra',)
+    _fields = ()
+    _known = frozenset()
+    _interned = frozenset()
+    _timestamps = ()
+    _values = staticmethod(lambda record: ())
+
+    def __init__(self, data=()):
+        data = dict(data)
+        for field in self._fields:
+            value = data.pop(field, MISSING)
+            if type(value) is str:
+                if field in self._interned:
+                    value = sys.intern(value)
+                elif field in self._timestamps:
+                    value = encode_time(value)
+            setattr(self, field, value)
+        self._extra = data or None
+
+    def __getitem__(self, key):
+        if key in self._known:
+            value = getattr(self, key)
+            if value is MISSING:
+                raise KeyError(key)
+            if type(value) is int and key in self._timestamps:
+                return decode_time(value)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key, default=None):
+        if key in self._known:
+            value = getattr(self, key)
+            if value is MISSING:
+                return default
+            if type(value) is int and key in self._timestamps:
+                return decode_time(value)
+            return value
+        if self._extra is None:
+            return default
+        return self._extra.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key in self._known:
+            if type(value) is str:
+                if key in self._interned:
+                    value = sys.intern(value)
+                elif key in self._timestamps:
+                    value = encode_time(value)
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._known and getattr(self, key) is not MISSING:
+            setattr(self, key, MISSING)
+        elif key not in self._known and self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self._known:
+            return getattr(self, key) is not MISSING
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        return iter(self.copy())
+
+    def __len__(self):
+        return len(self.copy())
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.copy()!r})'
+
+    def copy(self):
+        """The record as a plain dict"""
+        data = {field: value for field, value in zip(self._fields, self._values(self)) if value is not MISSING}
+        for field in self._timestamps:
+            if type(data.get(field)) is int:
+                data[field] = decode_time(data[field])
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+
+def record_type(name, fields, interned=(), timestamps=('created_at',)):
+    """Make a Record subclass with a slot per field"""
+    for field in fields:
+        if not field.isidentifier() or field.startswith('_') or hasattr(Record, field):
+            raise ValueError(f'{field!r} cannot be a record field')
+    return type(name, (Record,), {
+        '__slots__': tuple(fields),
+        '_fields': tuple(fields),
+        '_known': frozenset(fields),
+        '_interned': frozenset(interned),
+        '_timestamps': tuple(field for field in timestamps if field in fields),
+        # Reads every slot in one C call
+        '_values': staticmethod(attrgetter(*fields)) if len(fields) > 1 else staticmethod(lambda r: (getattr(r, fields[0]),)),
+    })
+
+
+def to_json(value):
+    """json.dumps default= hook for records"""
+    if isinstance(value, Record):
+        return value.copy()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
@@ -0,0 +1,39 @@
+"""Streaming CSV exports for the admin reports"""
+import csv
+from datetime import datetime
+from io import StringIO
+
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(args):
+    """Read the optional since (inclusive) / until (exclusive) ISO dates from the query string.
+
+    Returns a predicate over ISO timestamps; raises ValueError for bad dates.
+    """
+    bounds = []
+    for name in ('since', 'until'):
+        value = args.get(name)
+        if value:
+            try:
+                value = datetime.fromisoformat(value).isoformat()
+            except ValueError:
+                raise ValueError(f'{name} must be an ISO date')
+        bounds.append(value)
+    since, until = bounds
+    return lambda created_at: (not since or created_at >= since) and (not until or created_at < until)
+
+
+def csv_chunks(fieldnames, rows):
+    """Yield the CSV for rows in ~64KB chunks, holding at most one chunk in memory"""
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
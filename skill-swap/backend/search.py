@@ -0,0 +1,197 @@
+"""Inverted full-text index used by skill search"""
+import bisect
+import heapq
+import itertools
+import re
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return TOKEN_RE.findall(text.lower())
+
+
+def merge_ids(*id_streams):
+    """Lazily merge ascending id streams into one ascending stream without duplicates"""
+    if len(id_streams) == 1:
+        return iter(id_streams[0])
+    return _unique(heapq.merge(*id_streams))
+
+
+def _unique(ids):
+    last = None
+    for record_id in ids:
+        if record_id != last:
+            yield record_id
+            last = record_id
+
+
+class TextIndex(object):
+    """Token -> {record id: weight} postings with prefix lookup.
+
+    `fields` maps record fields to a relevance weight; list fields such as
+    tags are indexed item by item. Distinct tokens are kept in a sorted
+    vocabulary so a prefix expands with a binary search instead of a scan.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self._postings = {}
+        self._vocabulary = []
+        self._record_terms = {}
+
+    def _weights(self, record):
+        weights = {}
+        for field, weight in self.fields.items():
+            value = record.get(field) or ''
+            for item in (value if isinstance(value, (list, tuple)) else [value]):
+                for token in tokenize(str(item)):
+                    weights[token] = weights.get(token, 0) + weight
+        return weights
+
+    def add(self, record):
+        weights = self._weights(record)
+        for token, weight in weights.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                bisect.insort(self._vocabulary, token)
+            postings[record['id']] = weight
+        self._record_terms[record['id']] = list(weights)
+
+    def remove(self, record):
+        for token in self._record_terms.pop(record['id'], ()):
+            postings = self._postings[token]
+            postings.pop(record['id'], None)
+            if not postings:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _expand(self, prefix):
+        """Return every indexed token that starts with prefix"""
+        start = end = bisect.bisect_left(self._vocabulary, prefix)
+        while end < len(self._vocabulary) and self._vocabulary[end].startswith(prefix):
+            end += 1
+        return self._vocabulary[start:end]
+
+    def search(self, query):
+        """Return ids of records matching every query token as a prefix, best match first"""
+        return [record_id for record_id, _ in self.ranked(query)]
+
+    def ranked(self, query):
+        """Return (record id, score) pairs for records matching every query token.
+
+        Exact token hits count double over prefix-only hits; ties keep id order.
+        """
+        scores = None
+        for token in set(tokenize(query)):
+            matches = {}
+            for term in self._expand(token):
+                boost = 2 if term == token else 1
+                for record_id, weight in self._postings[term].items():
+                    matches[record_id] = matches.get(record_id, 0) + weight * boost
+            if scores is None:
+                scores = matches
+            else:
+                scores = {rid: score + matches[rid] for rid, score in scores.items() if rid in matches}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SubstringIndex(object):
+    """Case-insensitive substring lookup over the distinct values of some record fields.
+
+    Each distinct lowercased value maps to the sorted ids of the records
+    holding it, and each trigram maps to the distinct values containing it. A
+    query intersects the value sets of its own trigrams and only verifies the
+    few candidates left, so cost follows the matches rather than the record
+    count. Queries shorter than three characters scan the distinct values
+    instead. iter_ids() merges the matching id lists lazily from a cursor, so
+    a page of results costs about its own size.
+    """
+
+    def __init__(self, *fields):
+        self.fields = fields
+        self._ids = {}
+        self._trigrams = {}
+        self._record_values = {}
+
+    def _values(self, record):
+        values = set()
+        for field in self.fields:
+            value = record.get(field) or ''
+            for item in (value if isinstance(value, (list, tuple)) else [value]):
+                values.add(str(item).lower())
+        return values
+
+    def add(self, record):
+        values = self._values(record)
+        self._record_values[record['id']] = values
+        for value in values:
+            ids = self._ids.get(value)
+            if ids is None:
+                ids = self._ids[value] = []
+                for gram in trigrams(value):
+                    self._trigrams.setdefault(gram, set()).add(value)
+            if not ids or ids[-1] < record['id']:
+                ids.append(record['id'])  # new records have the highest id
+            else:
+                bisect.insort(ids, record['id'])
+
+    def remove(self, record):
+        for value in self._record_values.pop(record['id'], ()):
+            ids = self._ids[value]
+            del ids[bisect.bisect_left(ids, record['id'])]
+            if not ids:
+                del self._ids[value]
+                for gram in trigrams(value):
+                    values = self._trigrams[gram]
+                    values.discard(value)
+                    if not values:
+                        del self._trigrams[gram]
+
+    def _values_containing(self, needle):
+        grams = trigrams(needle)
+        if grams:
+            postings = sorted((self._trigrams.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*postings)
+        else:
+            candidates = self._ids
+        return [value for value in candidates if needle in value]
+
+    def count_containing(self, text):
+        """How many records ids_containing(text) would return, without building the set"""
+        return sum(len(self._ids[value]) for value in self._values_containing(text.lower()))
+
+    def ids_containing(self, text):
+        """Ids of records with any value containing text (case-insensitive)"""
+        found = set()
+        for value in self._values_containing(text.lower()):
+            found.update(self._ids[value])
+        return found
+
+    def iter_ids(self, text, after=0):
+        """Ascending ids above `after` of records with any value containing text"""
+        streams = []
+        for value in self._values_containing(text.lower()):
+            ids = self._ids[value]
+            streams.append(itertools.islice(ids, bisect.bisect_right(ids, after), None))
+        return merge_ids(*streams)
+
+    def matcher(self, text):
+        """A predicate telling whether a record has any value containing text.
+
+        The matching values are found once, so each check is a set test
+        against the record's precomputed lowercased values.
+        """
+        values = frozenset(self._values_containing(text.lower()))
+        record_values = self._record_values
+        return lambda record_id: not values.isdisjoint(record_values.get(record_id, ()))
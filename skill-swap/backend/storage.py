@@ -0,0 +1,185 @@
+"""SQLite storage backend that lets several worker processes share one store"""
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from records import to_json
+
+# Change-log rows kept for other workers to catch up from; a worker further behind reloads everything
+CHANGE_LOG_RETENTION = 100000
+
+
+class SQLiteBackend(object):
+    """Persists collections as JSON rows in one SQLite database.
+
+    Each collection is a table keyed by id with the record serialized in
+    `data`, plus real indexed columns for the fields it asks to keep
+    queryable. The database runs in WAL mode so readers in other processes
+    never block on a writer. Connections come from a small pool, and all SQL
+    is fixed per table so sqlite3's statement cache reuses the prepared
+    statements. Every write also appends to a `changes` table, which is how
+    each process picks up the others' writes in changes(). Ids for new
+    records are reserved in a `sequences` table, so no two processes hand
+    out the same one.
+    """
+
+    def __init__(self, path, pool_size=4):
+        self.path = path
+        self._tables = {}
+        self._lock = threading.Lock()
+        self._pool = queue.LifoQueue()
+        for _ in range(pool_size):
+            self._pool.put(self._connect())
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS changes ('
+                         'seq INTEGER PRIMARY KEY AUTOINCREMENT, collection TEXT NOT NULL, record_id INTEGER NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            self._seen = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=256)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def register(self, name, columns, unique):
+        for identifier in (name,) + tuple(columns):
+            if not identifier.isidentifier():
+                raise ValueError(f'Invalid table or column name {identifier!r}')
+        with self._connection() as conn:
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {name} (id INTEGER PRIMARY KEY, data TEXT NOT NULL)')
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_info({name})')}
+            for column in columns:
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE {name} ADD COLUMN {column}')
+                    conn.execute(f"UPDATE {name} SET {column} = json_extract(data, '$.{column}')")
+                kind = 'UNIQUE INDEX' if column in unique else 'INDEX'
+                conn.execute(f'CREATE {kind} IF NOT EXISTS idx_{name}_{column} ON {name} ({column})')
+        names = ''.join(f', {column}' for column in columns)
+        params = ', '.join('?' * (len(columns) + 2))
+        assignments = ''.join(f', {column} = ?' for column in columns)
+        self._tables[name] = {
+            'columns': tuple(columns),
+            'insert': f'INSERT INTO {name} (id, data{names}) VALUES ({params})',
+            'update': f'UPDATE {name} SET data = ?{assignments} WHERE id = ?',
+            'delete': f'DELETE FROM {name} WHERE id = ?',
+            'select': f'SELECT data FROM {name} WHERE id = ?',
+            'load': f'SELECT data FROM {name} ORDER BY id',
+            'max_id': f'SELECT COALESCE(MAX(id), 0) FROM {name}',
+        }
+
+    def load(self, name):
+        with self._connection() as conn:
+            return [json.loads(row[0]) for row in conn.execute(self._tables[name]['load'])]
+
+    def insert(self, name, record):
+        table = self._tables[name]
+        values = [record['id'], json.dumps(record, default=to_json)] + [record.get(c) for c in table['columns']]
+        try:
+            self._write(name, record['id'], table['insert'], values)
+        except sqlite3.IntegrityError as e:
+            raise KeyError(f'{name} {record["id"]} conflicts with a stored record: {e}')
+
+    def insert_many(self, name, records):
+        """Insert a batch of records in a single transaction"""
+        table = self._tables[name]
+        rows = [[record['id'], json.dumps(record, default=to_json)] + [record.get(c) for c in table['columns']] for record in records]
+        try:
+            self._write_many(name, [record['id'] for record in records], table['insert'], rows)
+        except sqlite3.IntegrityError as e:
+            raise KeyError(f'{name} batch conflicts with a stored record: {e}')
+
+    def update(self, name, record):
+        table = self._tables[name]
+        values = [json.dumps(record, default=to_json)] + [record.get(c) for c in table['columns']] + [record['id']]
+        self._write(name, record['id'], table['update'], values)
+
+    def delete(self, name, record_id):
+        self._write(name, record_id, self._tables[name]['delete'], (record_id,))
+
+    def _write(self, name, record_id, sql, params):
+        """Run one write and its change-log entry in a single transaction"""
+        self._write_many(name, [record_id], sql, [params])
+
+    def _write_many(self, name, record_ids, sql, rows):
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(sql, rows)
+                conn.executemany('INSERT INTO changes (collection, record_id) VALUES (?, ?)',
+                                 [(name, record_id) for record_id in record_ids])
+                seq = conn.execute('SELECT MAX(seq) FROM changes').fetchone()[0]
+                first = seq - len(record_ids) + 1
+                if seq // 1000 != (first - 1) // 1000:
+                    conn.execute('DELETE FROM changes WHERE seq <= ?', (seq - CHANGE_LOG_RETENTION,))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        with self._lock:
+            # Our own writes need no replay unless another process wrote in between
+            if first == self._seen + 1:
+                self._seen = seq
+
+    def flush(self):
+        # Writes are committed before they return
+        pass
+
+    def allocate_ids(self, name, count, floor):
+        """Reserve count ids above floor, the stored ids and every id reserved before; return the first"""
+        with self._connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute('SELECT value FROM sequences WHERE name = ?', (name,)).fetchone()
+                stored = conn.execute(self._tables[name]['max_id']).fetchone()[0]
+                start = max(row[0] if row else 0, stored, floor) + 1
+                conn.execute('INSERT OR REPLACE INTO sequences (name, value) VALUES (?, ?)', (name, start + count - 1))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return start
+
+    def snapshot_due(self):
+        # Every write is already in the database
+        return False
+
+    def changes(self):
+        """Return (collection, record id) for the records written since the last call.
+
+        Returns None when the change log no longer reaches back far enough
+        and the caller should reload every collection. The records are not
+        read here: the caller fetch()es each one while holding its
+        collection's write lock, so that a local write cannot land between
+        the read and the apply and then be overwritten by the older copy.
+        """
+        with self._lock:
+            seen = self._seen
+        with self._connection() as conn:
+            rows = conn.execute('SELECT seq, collection, record_id FROM changes WHERE seq > ? ORDER BY seq',
+                                (seen,)).fetchall()
+        if not rows:
+            return []
+        with self._lock:
+            self._seen = max(self._seen, rows[-1][0])
+        if rows[0][0] != seen + 1:
+            return None
+        touched = dict.fromkeys((name, record_id) for _, name, record_id in rows)
+        return [(name, record_id) for name, record_id in touched if name in self._tables]
+
+    def fetch(self, name, record_id):
+        """The stored record, or None when it has been deleted"""
+        with self._connection() as conn:
+            row = conn.execute(self._tables[name]['select'], (record_id,)).fetchone()
+        return json.loads(row[0]) if row else None
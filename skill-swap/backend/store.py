@@ -0,0 +1,612 @@
+"""In-memory record store with primary-key and unique-field indexes"""
+import bisect
+import gc
+import threading
+from contextlib import contextmanager
+
+# Deleted ids are left in the id order until they outnumber the live ones
+COMPACT_AFTER = 1024
+# Records copied per read-lock hold while a snapshot reads a collection
+SNAPSHOT_CHUNK = 5000
+
+
+@contextmanager
+def paused_gc():
+    """Suspend the cyclic garbage collector while building many long-lived objects.
+
+    Records never form cycles, but each allocation burst still triggers full
+    collections that rescan every record already loaded.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class RWLock(object):
+    """Any number of readers or one writer; a waiting writer holds back new readers.
+
+    Both sides are reentrant in the holding thread, and the writer may also
+    read. Starting a write while holding a read lock raises RuntimeError
+    rather than deadlocking against another reader doing the same.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writes = 0
+        self._waiting = 0
+        self._local = threading.local()
+
+    def acquire_read(self):
+        reads = getattr(self._local, 'reads', 0)
+        if reads == 0 and self._writer != threading.get_ident():
+            with self._cond:
+                while self._writer is not None or self._waiting:
+                    self._cond.wait()
+                self._readers += 1
+            self._local.shared = True
+        elif reads == 0:
+            self._local.shared = False
+        self._local.reads = reads + 1
+
+    def release_read(self):
+        self._local.reads -= 1
+        if self._local.reads == 0 and self._local.shared:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._writes += 1
+            return
+        if getattr(self._local, 'reads', 0):
+            raise RuntimeError('Cannot write while holding a read lock')
+        with self._cond:
+            self._waiting += 1
+            while self._writer is not None or self._readers:
+                self._cond.wait()
+            self._waiting -= 1
+            self._writer = me
+            self._writes = 1
+
+    def release_write(self):
+        self._writes -= 1
+        if self._writes == 0:
+            with self._cond:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class Collection(object):
+    """Ordered id -> record map that keeps unique-field indexes in sync.
+
+    Records are plain dicts with an integer 'id'. Iteration follows insertion
+    order, so listings look the same as they did with plain lists. Secondary
+    indexes registered with attach() get add/remove calls on every write, and
+    every write is passed on to the storage backend. An index may also define
+    check(record), which is run before anything is written and raises
+    ValueError for a record it could not take. A write whose indexing fails
+    anyway is undone, locally and in the backend.
+
+    Writes hold `lock` exclusively, so concurrent requests never see (or
+    lose) a half-applied write. Plain lookups need no lock; code that walks
+    indexes should hold lock.read(). Ids come from next_id(), which hands
+    each one out only once.
+    """
+
+    def __init__(self, name, unique=(), backend=None, record_type=None):
+        self.name = name
+        self.backend = backend or MemoryBackend()
+        self.unique = tuple(unique)
+        # Records are stored as this compact mapping type when one is given
+        self.record_type = record_type
+        self._by_id = {}
+        self._unique = {field: {} for field in unique}
+        self._last_id = 0
+        self._next_id = 1
+        self._id_lock = threading.Lock()
+        # Ids in order, including deleted ones not yet compacted away
+        self._order = []
+        self._dead = 0
+        self._indexes = []
+        self.lock = RWLock()
+        # Bumped on every local or replayed write; caches key on it
+        self.version = 0
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __contains__(self, record_id):
+        return record_id in self._by_id
+
+    def attach(self, index):
+        """Keep a secondary index (any object with add/remove) in sync and return it"""
+        with self.lock.write():
+            for record in self._by_id.values():
+                index.add(record)
+            self._indexes.append(index)
+        return index
+
+    def next_id(self, count=1, after=0):
+        """Reserve count consecutive ids for new records and return the first.
+
+        Reserved ids are above every id stored (and above `after`) and are
+        never handed out again, even to concurrent callers, so two requests
+        cannot both pick the same id.
+        """
+        with self._id_lock:
+            floor = max(self._last_id, after)
+            start = self.backend.allocate_ids(self.name, count, floor)
+            if start is None:
+                start = max(self._next_id, floor + 1)
+            self._next_id = start + count
+            return start
+
+    def first(self):
+        """Return the oldest record still stored, or None"""
+        with self.lock.read():
+            for record_id in self._order:
+                record = self._by_id.get(record_id)
+                if record is not None:
+                    return record
+        return None
+
+    def last(self, count):
+        """Return up to count of the newest records (highest ids), newest first"""
+        found = []
+        with self.lock.read():
+            for record_id in reversed(self._order):
+                if len(found) == count:
+                    break
+                record = self._by_id.get(record_id)
+                if record is not None:
+                    found.append(record)
+        return found
+
+    def get(self, record_id):
+        return self._by_id.get(record_id)
+
+    def after(self, record_id=0):
+        """Iterate records with an id greater than record_id, in id order.
+
+        Records are gathered a chunk at a time under the read lock and
+        yielded outside it, so a slow consumer never holds writers back.
+        Each chunk re-seeks from the last id, so writes in between cannot
+        make the iteration skip records.
+        """
+        size = 16
+        while True:
+            chunk = []
+            with self.lock.read():
+                order = self._order
+                i = bisect.bisect_right(order, record_id)
+                while i < len(order) and len(chunk) < size:
+                    record = self._by_id.get(order[i])
+                    if record is not None:
+                        chunk.append(record)
+                    i += 1
+                done = i >= len(order)
+                if i:
+                    record_id = order[i - 1]
+            yield from chunk
+            if done:
+                return
+            size = min(size * 2, 1024)
+
+    def get_many(self, record_ids):
+        """Resolve each distinct id once and return an id -> record map"""
+        found = {}
+        for record_id in set(record_ids):
+            record = self._by_id.get(record_id)
+            if record is not None:
+                found[record_id] = record
+        return found
+
+    def get_by(self, field, value):
+        """Look up a record by one of the collection's unique fields"""
+        return self._unique[field].get(value)
+
+    def insert(self, record):
+        """Store a new record and return the stored copy"""
+        record = self._make(record)
+        record_id = record['id']
+        with self.lock.write():
+            if record_id in self._by_id:
+                raise KeyError(f'{self.name} id {record_id} already exists')
+            self._check_unique(record)
+            self.check(record)
+            self.backend.insert(self.name, record)
+            try:
+                self._put(record)
+            except Exception:
+                self.backend.delete(self.name, record_id)
+                raise
+        self.backend.flush()
+        return record
+
+    def extend(self, records):
+        for record in records:
+            self.insert(record)
+
+    def insert_many(self, records):
+        """Insert a batch in one backend write; nothing is stored if any record conflicts"""
+        ids = set()
+        values = {field: set() for field in self._unique}
+        records = [self._make(record) for record in records]
+        with self.lock.write():
+            for record in records:
+                if record['id'] in self._by_id or record['id'] in ids:
+                    raise KeyError(f'{self.name} id {record["id"]} already exists')
+                ids.add(record['id'])
+                self._check_unique(record)
+                self.check(record)
+                for field, seen in values.items():
+                    if field in record:
+                        if record[field] in seen:
+                            raise KeyError(f'{self.name} {field} {record[field]!r} already exists')
+                        seen.add(record[field])
+            self.backend.insert_many(self.name, records)
+            for i, record in enumerate(records):
+                try:
+                    self._put(record)
+                except Exception:
+                    for stored in records[:i]:
+                        self._drop(stored['id'])
+                    for stored in records:
+                        self.backend.delete(self.name, stored['id'])
+                    raise
+        self.backend.flush()
+        return records
+
+    def update(self, record_id, changes):
+        """Apply changes to a stored record, reindex it and return it (None if missing)"""
+        with self.lock.write():
+            record = self._by_id.get(record_id)
+            if record is None:
+                return None
+            self._check_unique(changes, record)
+            original = dict(record)
+            updated = dict(record, **changes)
+            self.check(updated)
+            self.backend.update(self.name, updated)
+            self._unindex(record)
+            record.update(changes)
+            try:
+                self._index(record)
+            except Exception:
+                record.clear()
+                record.update(original)
+                self._index(record)
+                self.backend.update(self.name, original)
+                raise
+            self.version += 1
+        self.backend.flush()
+        return record
+
+    def delete(self, record_id):
+        """Remove a record by id and return it, or None if it was not stored"""
+        with self.lock.write():
+            if record_id not in self._by_id:
+                return None
+            self.backend.delete(self.name, record_id)
+            record = self._drop(record_id)
+        self.backend.flush()
+        return record
+
+    def check(self, record):
+        """Raise ValueError if an attached index cannot take record"""
+        for index in self._indexes:
+            check = getattr(index, 'check', None)
+            if check is not None:
+                check(record)
+
+    def clear(self):
+        for record_id in list(self._by_id):
+            self.delete(record_id)
+        with self._id_lock:
+            self._last_id = 0
+            self._next_id = 1
+
+    def chunks(self, size=SNAPSHOT_CHUNK):
+        """Yield copies of the records, size at a time, each batch taken under the read lock.
+
+        The lock is released between batches, so writes can land while the
+        records are read: a record may come out before or after a write made
+        meanwhile, and one inserted meanwhile may be missing.
+        """
+        with self.lock.read():
+            ids = list(self._by_id)
+        for start in range(0, len(ids), size):
+            with self.lock.read(), paused_gc():
+                chunk = [record.copy() for record in map(self._by_id.get, ids[start:start + size])
+                         if record is not None]
+            yield chunk
+
+    def load(self):
+        """Replace the local contents with what the backend has stored"""
+        with self.lock.write():
+            for record_id in list(self._by_id):
+                self._drop(record_id)
+            with paused_gc():
+                for record in self.backend.load(self.name):
+                    self._put(record)
+
+    # Local bookkeeping shared by writes and by changes replayed from the backend;
+    # callers hold the write lock
+
+    def _make(self, record):
+        if self.record_type is None or isinstance(record, self.record_type):
+            return record
+        return self.record_type(record)
+
+    def _check_unique(self, record, current=None):
+        for field, index in self._unique.items():
+            other = index.get(record.get(field))
+            if field in record and other is not None and other is not current:
+                raise KeyError(f'{self.name} {field} {record[field]!r} already exists')
+
+    def _index(self, record):
+        """Add record to every index, or (when one fails) to none"""
+        for field, index in self._unique.items():
+            if field in record:
+                index[record[field]] = record
+        added = []
+        try:
+            for index in self._indexes:
+                index.add(record)
+                added.append(index)
+        except Exception:
+            for index in reversed(added):
+                index.remove(record)
+            for field, index in self._unique.items():
+                if index.get(record.get(field)) is record:
+                    del index[record[field]]
+            raise
+
+    def _unindex(self, record):
+        for field, index in self._unique.items():
+            if index.get(record.get(field)) is record:
+                del index[record[field]]
+        for index in self._indexes:
+            index.remove(record)
+
+    def _put(self, record):
+        """Store or replace a record locally without telling the backend"""
+        record = self._make(record)
+        record_id = record['id']
+        old = self._by_id.get(record_id)
+        if old is not None:
+            self._unindex(old)
+        try:
+            self._index(record)
+        except Exception:
+            if old is not None:
+                self._index(old)
+            raise
+        if old is None:
+            if not self._order or record_id > self._order[-1]:
+                self._order.append(record_id)
+            else:
+                i = bisect.bisect_left(self._order, record_id)
+                if i < len(self._order) and self._order[i] == record_id:
+                    # Stored again after a delete that was not compacted away yet
+                    self._dead -= 1
+                else:
+                    self._order.insert(i, record_id)
+        self._by_id[record_id] = record
+        self._last_id = max(self._last_id, record_id)
+        self.version += 1
+
+    def _drop(self, record_id):
+        record = self._by_id.pop(record_id, None)
+        if record is None:
+            return None
+        # Deleting from the middle of the id order would shift everything after it
+        self._dead += 1
+        if self._dead > COMPACT_AFTER and self._dead > len(self._by_id):
+            self._order = [i for i in self._order if i in self._by_id]
+            self._dead = 0
+        self._unindex(record)
+        self.version += 1
+        return record
+
+
+class Repository(object):
+    """The set of collections sharing one storage backend"""
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+        self.collections = {}
+
+    def collection(self, name, unique=(), columns=(), record_type=None):
+        """Create a collection, loading whatever the backend already stores.
+
+        `columns` are record fields the backend should keep queryable (for
+        SQLite: real columns with an index); unique fields are included.
+        """
+        self.backend.register(name, tuple(unique) + tuple(c for c in columns if c not in unique), unique)
+        collection = self.collections[name] = Collection(name, unique, self.backend, record_type)
+        collection.load()
+        return collection
+
+    def _locks(self):
+        # Always taken in the same order, so two threads holding several cannot deadlock
+        return [self.collections[name].lock for name in sorted(self.collections)]
+
+    def acquire_read(self):
+        """Hold every collection's read lock, e.g. for the length of a read-only request"""
+        for lock in self._locks():
+            lock.acquire_read()
+
+    def release_read(self):
+        for lock in reversed(self._locks()):
+            lock.release_read()
+
+    def snapshot(self):
+        """Have the backend persist every collection's records as a snapshot.
+
+        No lock is held here: the backend reads the records in chunks
+        (Collection.chunks) on its own thread, while requests carry on.
+        """
+        self.backend.snapshot({name: collection.chunks() for name, collection in self.collections.items()})
+
+    def sync(self):
+        """Apply writes other processes made to the shared backend since the last sync,
+        and take a snapshot when the backend asks for one"""
+        if self.backend.snapshot_due():
+            self.snapshot()
+        changes = self.backend.changes()
+        if changes is None:
+            for collection in self.collections.values():
+                collection.load()
+            return
+        for name, record_id in changes:
+            collection = self.collections.get(name)
+            if collection is None:
+                continue
+            with collection.lock.write():
+                # Read under the lock: a local write to the record either
+                # finished before (and is what we read) or waits for us
+                record = self.backend.fetch(name, record_id)
+                if record is None:
+                    collection._drop(record_id)
+                else:
+                    collection._put(record)
+
+
+class MemoryBackend(object):
+    """Keeps nothing outside the process; the default for demos and tests"""
+
+    def register(self, name, columns, unique):
+        pass
+
+    def load(self, name):
+        return []
+
+    def insert(self, name, record):
+        pass
+
+    def insert_many(self, name, records):
+        pass
+
+    def update(self, name, record):
+        pass
+
+    def delete(self, name, record_id):
+        pass
+
+    def flush(self):
+        pass
+
+    def allocate_ids(self, name, count, floor):
+        # The collection's own counter is authoritative in a single process
+        return None
+
+    def changes(self):
+        return []
+
+    def fetch(self, name, record_id):
+        return None
+
+    def snapshot_due(self):
+        return False
+
+
+class RecordCache(object):
+    """Per-record derived values (such as response projections), computed on
+    first use and dropped whenever the record is written"""
+
+    def __init__(self, build):
+        self.build = build
+        self._values = {}
+
+    def add(self, record):
+        self._values.pop(record['id'], None)
+
+    def remove(self, record):
+        self._values.pop(record['id'], None)
+
+    def get(self, record):
+        value = self._values.get(record['id'])
+        if value is None:
+            value = self._values[record['id']] = self.build(record)
+        return value
+
+
+def normalize(value):
+    """Case- and whitespace-insensitive form of a facet value"""
+    return ' '.join(str(value or '').lower().split())
+
+
+class FacetIndex(object):
+    """Normalized field value -> set of record ids, for filters and facet counts"""
+
+    def __init__(self, field):
+        self.field = field
+        self._ids = {}
+        self._labels = {}
+
+    def add(self, record):
+        key = normalize(record.get(self.field))
+        ids = self._ids.get(key)
+        if ids is None:
+            ids = self._ids[key] = set()
+            self._labels[key] = record.get(self.field)
+        ids.add(record['id'])
+
+    def remove(self, record):
+        key = normalize(record.get(self.field))
+        ids = self._ids.get(key)
+        if ids is None:
+            return
+        ids.discard(record['id'])
+        if not ids:
+            del self._ids[key]
+            del self._labels[key]
+
+    def ids(self, value):
+        """Ids of records whose value equals value (normalized); do not mutate"""
+        return self._ids.get(normalize(value), set())
+
+    def ids_containing(self, text):
+        """Ids of records whose value contains text; scans distinct values only"""
+        needle = normalize(text)
+        found = set()
+        for key, ids in self._ids.items():
+            if needle in key:
+                found |= ids
+        return found
+
+    def values(self):
+        """Distinct values as first stored"""
+        return list(self._labels.values())
+
+    def counts(self):
+        return {self._labels[key]: len(ids) for key, ids in self._ids.items()}
@@ -10,41 +10,20 @@ const Dashboard = () => {
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    fetchStats();
-    fetchRecentSwaps();
-    fetchMessages();
+    fetchDashboard();
   }, []);
 
-  const fetchStats = async () => {
+  const fetchDashboard = async () => {
     try {
-      const [skillsRes, swapsRes] = await Promise.all([
-        axios.get('/api/skills'),
-        axios.get('/api/swap-requests'),
-      ]);
-      const mySkills = skillsRes.data.filter(s => s.user && s.user.id === user?.id);
-      const mySwaps = swapsRes.data.filter(s => s.from_user_id === user?.id || s.to_user_id === user?.id);
-      const myFeedback = mySwaps.filter(s => s.feedback).length;
-      setStats({ skills: mySkills.length, swaps: mySwaps.length, feedback: myFeedback });
+      // One request for the counts, recent swaps and announcements
+      const res = await axios.get('/api/dashboard');
+      const { counts } = res.data;
+      setStats({ skills: counts.skills, swaps: counts.swaps, feedback: counts.feedback });
+      setRecentSwaps(res.data.recent_swaps);
+      setMessages(res.data.messages);
     } catch (err) {
       setStats({ skills: 0, swaps: 0, feedback: 0 });
-    }
-  };
-
-  const fetchRecentSwaps = async () => {
-    try {
-      const res = await axios.get('/api/swap-requests');
-      const mySwaps = res.data.filter(s => s.from_user_id === user?.id || s.to_user_id === user?.id);
-      setRecentSwaps(mySwaps.slice(-5).reverse());
-    } catch (err) {
       setRecentSwaps([]);
-    }
-  };
-
-  const fetchMessages = async () => {
-    try {
-      const res = await axios.get('/api/admin/messages');
-      setMessages(res.data.slice(-3).reverse());
-    } catch (err) {
       setMessages([]);
     }
   };
@@ -13,6 +13,20 @@ function SwapRequests() {
     fetchRequests();
   }, []);
 
+  // Apply swap request changes pushed by the server instead of re-fetching
+  useEffect(() => {
+    const source = new EventSource('/api/events');
+    source.addEventListener('swap_request', (e) => {
+      const { action, request } = JSON.parse(e.data);
+      setRequests((current) => {
+        const rest = current.filter((r) => r.id !== request.id);
+        if (action === 'deleted') return rest;
+        return [...rest, request].sort((a, b) => a.id - b.id);
+      });
+    });
+    return () => source.close();
+  }, []);
+
   const fetchRequests = async () => {
     setLoading(true);
     try {